@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tetrahedralworkshop.core import Settings, Solver
+from tetrahedralworkshop.shapes import GroundCollider, make_cube_tets
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Benchmarks the core solver on synthetic tet meshes, without Blender, a GUI
+# or a GPU. Every phase of a frame is timed separately and the results are
+# written as JSON, so two runs can be compared:
+#
+#   python benchmarks/bench_solver.py --sizes 1000,10000 --output new.json
+#   python benchmarks/bench_solver.py --baseline old.json --threshold 0.2
+#
+# The second form exits with status 1 when any phase got slower than the
+# baseline by more than the threshold.
+
+DefaultSizes = (1000, 10000, 100000, 1000000)
+Phases = ("integration", "collisions", "edges", "volumes", "writeback")
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def cells_for_tets(tetCount):
+    return max(1, int(round((tetCount / 6.0) ** (1.0 / 3.0))))
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class PhaseTimer:
+    # Wraps solver methods on the instance and sums the time spent in them
+    def __init__(self, solver):
+        self.totals = dict.fromkeys(Phases, 0.0)
+        for phase, method in (("integration", "pre_solve"), ("collisions", "collisions"), ("edges", "solve_edges"), ("volumes", "solve_volumes")):
+            setattr(solver, method, self.wrap(phase, getattr(solver, method)))
+
+    def wrap(self, phase, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.totals[phase] += time.perf_counter() - start
+        return timed
+
+def get_solver_bytes(solver):
+    total = 0
+    for value in vars(solver).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, list):
+            total += sum(i.nbytes for i in value if isinstance(i, np.ndarray))
+    return total
+
+def run_size(tetCount, frames, warmup, settings):
+    n = cells_for_tets(tetCount)
+    restPos, tetIds, edgeIds = make_cube_tets(n)
+    start = time.perf_counter()
+    solver = Solver(restPos, tetIds, edgeIds)
+    setupTime = time.perf_counter() - start
+    # Pin nothing, drop the cube onto the ground from rest
+    collider = GroundCollider()
+    gravity = np.array((0.0, 0.0, -9.81))
+    dt = 1.0 / 24.0
+    output = np.empty(solver.vertCount * 3, dtype=np.float32)
+    for i in range(warmup):
+        solver.step(dt, gravity, settings, collider)
+    timer = PhaseTimer(solver)
+    stepTime = 0.0
+    for i in range(frames):
+        start = time.perf_counter()
+        solver.step(dt, gravity, settings, collider)
+        stepTime += time.perf_counter() - start
+        # Write-back is the flat float32 buffer handed to foreach_set, in
+        # the original vertex order
+        start = time.perf_counter()
+        output.reshape(-1, 3)[:] = solver.get_positions()
+        timer.totals["writeback"] += time.perf_counter() - start
+    timer.totals["integration"] -= timer.totals["collisions"]
+    frameTime = stepTime / frames + timer.totals["writeback"] / frames
+    return {
+        "tets": int(len(tetIds)),
+        "verts": int(solver.vertCount),
+        "edges": int(len(edgeIds)),
+        "frames": frames,
+        "setupSeconds": setupTime,
+        "phaseSeconds": {phase: timer.totals[phase] / frames for phase in Phases},
+        "frameSeconds": frameTime,
+        "tetsPerSecond": len(tetIds) / frameTime,
+        "bytesPerVertex": get_solver_bytes(solver) / solver.vertCount,
+        "lowestPoint": float(solver.verts[:, 2].min()),
+    }
+
+def compare(results, baseline, threshold):
+    # Regressions as (tets, phase, baseline seconds, new seconds)
+    regressions = []
+    previous = {i["tets"]: i for i in baseline["results"]}
+    for i in results["results"]:
+        old = previous.get(i["tets"])
+        if old is None:
+            continue
+        for phase in ("frameSeconds",) + Phases:
+            new = i["frameSeconds"] if phase == "frameSeconds" else i["phaseSeconds"][phase]
+            before = old["frameSeconds"] if phase == "frameSeconds" else old["phaseSeconds"].get(phase, 0.0)
+            # Phases that take almost nothing are too noisy to compare
+            if before > 0.0005 and new > before * (1.0 + threshold):
+                regressions.append((i["tets"], phase, before, new))
+    return regressions
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetrahedral Workshop solver benchmark")
+    parser.add_argument("--sizes", default=",".join(str(i) for i in DefaultSizes), help="comma separated tet counts")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--substeps", type=int, default=3)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown as a fraction")
+    args = parser.parse_args(argv)
+
+    settings = Settings(substeps=args.substeps)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "substeps": args.substeps,
+        },
+        "results": [],
+    }
+    for size in (int(i) for i in args.sizes.split(",")):
+        result = run_size(size, args.frames, args.warmup, settings)
+        results["results"].append(result)
+        phases = "  ".join("%s %.1fms" % (phase, result["phaseSeconds"][phase] * 1000.0) for phase in Phases)
+        print("%8d tets  %7.1f ms/frame  %10.0f tets/s  %6.0f B/vert  setup %.2fs  |  %s" % (
+            result["tets"], result["frameSeconds"] * 1000.0, result["tetsPerSecond"], result["bytesPerVertex"], result["setupSeconds"], phases))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for tets, phase, before, new in regressions:
+            print("REGRESSION %d tets %s: %.2fms -> %.2fms" % (tets, phase, before * 1000.0, new * 1000.0))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Marks the repository root for pytest, which puts it on sys.path so the
+# tests import the tetrahedralworkshop package without Blender installed.
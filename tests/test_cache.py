@@ -0,0 +1,60 @@
+import numpy as np
+from tetrahedralworkshop.cache import PointCache, get_topology_key, load_rest, load_topology, save_rest, save_topology
+from tetrahedralworkshop.core import Solver
+from tetrahedralworkshop.shapes import make_cube_tets
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def test_point_cache_stores_every_frame_step(tmp_path):
+    path = str(tmp_path / "body.tetcache")
+    cache = PointCache(path).create(4, 1, 10, 3)
+    # Frames 1, 4, 7 and 10 have a place in the file
+    assert cache.frames.shape == (4, 4, 3)
+    assert [i for i in range(0, 12) if cache.is_stored(i)] == [1, 4, 7, 10]
+    for frame in (1, 7, 10):
+        cache.write_frame(frame, np.full((4, 3), frame, dtype=np.float32))
+    assert [i for i in range(0, 12) if cache.has_frame(i)] == [1, 7, 10]
+    assert cache.get_latest_frame(6) == 1
+    assert cache.get_latest_frame(9) == 7
+    assert cache.get_latest_frame(20) == 10
+    assert cache.get_latest_frame(0) is None
+    cache.close()
+    # Reopened from the header alone
+    cache = PointCache(path)
+    assert cache.open(4, writable=False)
+    assert (cache.frameStart, cache.frameEnd, cache.frameStep) == (1, 10, 3)
+    for frame in (1, 7, 10):
+        assert (cache.read_frame(frame) == frame).all()
+    assert not cache.has_frame(4)
+    cache.close()
+    # A cache for another mesh is not opened
+    assert not PointCache(path).open(5)
+
+def test_topology_round_trip(tmp_path):
+    restPos, tetIds, edgeIds = make_cube_tets(2)
+    solver = Solver(restPos, tetIds, edgeIds)
+    path = str(tmp_path / "body.tettopo.npz")
+    key = get_topology_key(tetIds, edgeIds)
+    save_topology(path, key, solver.get_topology())
+    topology = load_topology(path, key)
+    assert topology is not None
+    for name, value in solver.get_topology().items():
+        if isinstance(value, list):
+            assert len(topology[name]) == len(value)
+            assert all(np.array_equal(a, b) for a, b in zip(topology[name], value))
+        else:
+            assert np.array_equal(topology[name], value)
+    rebuilt = Solver(restPos, topology["tetIds"], topology["edgeIds"], topology)
+    assert np.array_equal(rebuilt.tetIds, solver.tetIds)
+    assert np.array_equal(rebuilt.edgeIds, solver.edgeIds)
+    # Another connectivity does not load it
+    assert load_topology(path, get_topology_key(tetIds[1:], edgeIds)) is None
+    assert load_topology(str(tmp_path / "missing.tettopo.npz"), key) is None
+
+def test_rest_round_trip(tmp_path):
+    path = str(tmp_path / "body.tetrest.npy")
+    coords = np.arange(12, dtype=np.float32)
+    save_rest(path, coords)
+    assert np.array_equal(load_rest(path, 4), coords)
+    assert load_rest(path, 5) is None
+    assert load_rest(str(tmp_path / "missing.tetrest.npy"), 4) is None
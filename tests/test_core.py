@@ -0,0 +1,324 @@
+import numpy as np
+from tetrahedralworkshop import core
+from tetrahedralworkshop.core import Settings, Solver, SpatialHash, color_constraints, deform_points, embed_points, get_tet_volumes
+from tetrahedralworkshop.shapes import GroundCollider, make_cube_tets
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Tests of the core solver, without Blender. Run from the repository root:
+#
+#   python -m pytest -q
+
+def shuffled_cube(n):
+    # A cube whose vertices are numbered in random order, so the internal
+    # Morton order is a real permutation of the original one
+    restPos, tetIds, edgeIds = make_cube_tets(n)
+    shuffle = np.random.default_rng(1).permutation(len(restPos))
+    inverse = np.argsort(shuffle)
+    return restPos[shuffle], inverse[tetIds], inverse[edgeIds]
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def test_coloring_is_conflict_free_and_complete():
+    restPos, tetIds, edgeIds = make_cube_tets(3)
+    for ids in (tetIds, edgeIds):
+        colors = color_constraints(ids, len(restPos))
+        # Every constraint in exactly one color
+        assert np.array_equal(np.sort(np.concatenate(colors)), np.arange(len(ids)))
+        # No vertex twice within a color
+        for color in colors:
+            verts = ids[color].ravel()
+            assert len(np.unique(verts)) == len(verts)
+
+def test_solver_colors_are_conflict_free():
+    solver = Solver(*shuffled_cube(3))
+    for ids, colors in ((solver.tetIds, solver.tetColors), (solver.edgeIds, solver.edgeColors)):
+        assert sum(len(i) for i in colors) == len(ids)
+        for color in colors:
+            verts = ids[color].ravel()
+            assert len(np.unique(verts)) == len(verts)
+
+def test_accessors_round_trip_in_original_order():
+    restPos, tetIds, edgeIds = shuffled_cube(2)
+    solver = Solver(restPos, tetIds, edgeIds)
+    assert not np.array_equal(solver.order, np.arange(len(restPos)))
+    assert np.array_equal(solver.get_rest_positions(), restPos)
+    positions = np.random.default_rng(2).random((len(restPos), 3))
+    solver.set_positions(positions)
+    assert np.array_equal(solver.get_positions(), positions)
+    solver.set_previous_positions(positions * 2.0)
+    assert np.array_equal(solver.get_previous_positions(), positions * 2.0)
+    pinWeights = np.zeros(len(restPos))
+    pinWeights[:5] = 1.0
+    solver.set_pin_weights(pinWeights)
+    assert np.array_equal(solver.get_pin_weights(), pinWeights)
+    assert np.array_equal(solver.get_inverse_masses(), 1.0 - pinWeights)
+    assert np.array_equal(solver.to_original(solver.to_internal(positions)), positions)
+    # Internal tets are the original tets, renumbered
+    internal = np.sort(solver.order[solver.tetIds], axis=1)
+    original = np.sort(tetIds, axis=1)
+    assert np.array_equal(internal[np.lexsort(internal.T[::-1])], original[np.lexsort(original.T[::-1])])
+
+def test_topology_rebuilds_the_same_solver():
+    restPos, tetIds, edgeIds = shuffled_cube(2)
+    solver = Solver(restPos, tetIds, edgeIds)
+    # Rest positions are taken from the mesh, not the topology
+    moved = restPos * 1.5
+    topology = solver.get_topology()
+    rebuilt = Solver(moved, topology["tetIds"], topology["edgeIds"], topology)
+    assert np.array_equal(rebuilt.order, solver.order)
+    assert np.array_equal(rebuilt.tetIds, solver.tetIds)
+    assert np.array_equal(rebuilt.edgeIds, solver.edgeIds)
+    assert all(np.array_equal(a, b) for a, b in zip(rebuilt.tetColors, solver.tetColors))
+    assert all(np.array_equal(a, b) for a, b in zip(rebuilt.edgeColors, solver.edgeColors))
+    assert np.allclose(rebuilt.restVol, solver.restVol * 1.5 ** 3, rtol=1e-5)
+    assert np.allclose(rebuilt.edgeLengths, solver.edgeLengths * 1.5, rtol=1e-5)
+
+def test_cube_drops_onto_the_ground():
+    restPos, tetIds, edgeIds = make_cube_tets(2, height=0.5)
+    solver = Solver(restPos, tetIds, edgeIds)
+    settings = Settings()
+    collider = GroundCollider()
+    gravity = np.array((0.0, 0.0, -9.81))
+    for i in range(36):
+        solver.step(1.0 / 24.0, gravity, settings, collider)
+    positions = solver.get_positions()
+    # Resting on the ground at the collision radius, not through it
+    assert abs(positions[:, 2].min() - settings.collisionRadius) < 0.01
+    assert np.abs(solver.verts - solver.previousPos).max() < 1e-3
+    # No inverted tets and the volume kept
+    restVol = get_tet_volumes(restPos, tetIds)
+    volume = get_tet_volumes(positions, tetIds)
+    assert (volume > 0.0).all()
+    assert abs(volume.sum() / restVol.sum() - 1.0) < 0.05
+
+def drop_cube(n=2, frames=6, height=0.5, **settings):
+    # A cube dropped onto the ground, the solver after the given frames
+    restPos, tetIds, edgeIds = make_cube_tets(n, height=height)
+    solver = Solver(restPos, tetIds, edgeIds)
+    settings = Settings(**settings)
+    for i in range(frames):
+        solver.step(1.0 / 24.0, np.array((0.0, 0.0, -9.81)), settings, GroundCollider())
+    return solver
+
+def test_tolerance_stops_passes_early():
+    solver = drop_cube(distanceIterations=4, volumeIterations=4, frames=1)
+    assert (solver.distancePasses, solver.volumePasses) == (12, 12)
+    # Without a tolerance or adaptive substeps the error left is not measured
+    assert solver.distanceResidual == 0.0 and solver.volumeResidual == 0.0
+    solver = drop_cube(distanceIterations=4, volumeIterations=4, frames=1, tolerance=0.5)
+    assert solver.distancePasses == 3 and solver.volumePasses == 3
+    # The error left by the last substep, measured once after it
+    assert solver.distanceResidual == solver.get_edge_error()
+    assert solver.volumeResidual == solver.get_volume_error()
+
+def test_unreached_tolerance_changes_nothing():
+    # Measuring the error has no effect on the solve itself
+    a = drop_cube(distanceIterations=2, volumeIterations=2)
+    b = drop_cube(distanceIterations=2, volumeIterations=2, tolerance=1e-12)
+    assert (b.distancePasses, b.volumePasses) == (6, 6)
+    assert np.array_equal(a.get_positions(), b.get_positions())
+
+def test_adaptive_substeps_drop_while_resting():
+    # The error of a body sagging under its own weight stays, it does not
+    # hold the count
+    solver = drop_cube(n=4, frames=72, adaptiveSubsteps=True)
+    assert solver.substeps < Settings().substeps
+
+def test_reset_and_step_state_reproduce_a_run():
+    restPos, tetIds, edgeIds = make_cube_tets(2, height=2.0)
+    solver = Solver(restPos, tetIds, edgeIds)
+    settings = Settings(adaptiveSubsteps=True)
+    gravity = np.array((0.0, 0.0, -9.81))
+    def run(frames):
+        for i in range(frames):
+            solver.step(1.0 / 24.0, gravity, settings, GroundCollider())
+    run(8)
+    state = (solver.verts.copy(), solver.previousPos.copy(), solver.get_step_state())
+    run(8)
+    first = solver.get_positions()
+    # From rest again
+    solver.reset()
+    run(16)
+    assert np.array_equal(solver.get_positions(), first)
+    # From the state after frame 8
+    solver.verts[:] = state[0]
+    solver.previousPos[:] = state[1]
+    solver.currentPos[:] = state[1]
+    solver.set_step_state(state[2])
+    run(8)
+    assert np.array_equal(solver.get_positions(), first)
+
+def brute_force_pairs(points, positions, maxDist):
+    vector = points[:, None] - positions[None]
+    return set(zip(*np.nonzero(np.einsum("ijk,ijk->ij", vector, vector) < maxDist * maxDist)))
+
+def test_spatial_hash_finds_the_brute_force_pairs(monkeypatch):
+    rng = np.random.default_rng(3)
+    positions = rng.random((300, 3))
+    points = rng.random((200, 3)) * 1.2 - 0.1
+    grid = SpatialHash(0.15, positions)
+    expected = brute_force_pairs(points, positions, 0.15)
+    assert set(zip(*grid.query(points, 0.15))) == expected
+    # In chunks of a few points, the same pairs
+    monkeypatch.setattr(core, "NearestPairLimit", 100)
+    chunks = list(grid.query_chunks(points, 0.15))
+    assert len(chunks) > 1
+    assert set(zip(np.concatenate([i for i, j in chunks]), np.concatenate([j for i, j in chunks]))) == expected
+
+def test_self_collisions_do_not_depend_on_the_chunks(monkeypatch):
+    restPos, tetIds, edgeIds = make_cube_tets(3)
+    settings = Settings(selfCollision=True, collisionRadius=0.2)
+    positions = restPos + np.random.default_rng(4).normal(0.0, 0.05, restPos.shape)
+    moved = []
+    for limit in (core.NearestPairLimit, 50):
+        monkeypatch.setattr(core, "NearestPairLimit", limit)
+        solver = Solver(restPos, tetIds, edgeIds)
+        solver.set_positions(positions)
+        solver.solve_self_collisions(settings)
+        moved.append(solver.get_positions())
+    assert not np.array_equal(moved[0], positions)
+    assert np.allclose(moved[0], moved[1], rtol=0.0, atol=1e-12)
+
+def test_resting_body_sleeps_until_woken():
+    solver = drop_cube(frames=72, sleepThreshold=0.001, sleepFrames=5)
+    assert solver.sleeping
+    positions = solver.get_positions()
+    solver.step(1.0 / 24.0, np.array((0.0, 0.0, -9.81)), Settings(sleepThreshold=0.001), GroundCollider())
+    assert np.array_equal(solver.get_positions(), positions)
+    # Woken, it moves again, here held up by nothing
+    solver.wake()
+    solver.step(1.0 / 24.0, np.array((0.0, 0.0, -9.81)), Settings(sleepThreshold=0.001))
+    assert not solver.sleeping
+    assert solver.get_positions()[:, 2].max() < positions[:, 2].max()
+
+def test_embedded_points_follow_an_affine_map():
+    restPos, tetIds, edgeIds = make_cube_tets(3)
+    rng = np.random.default_rng(5)
+    # Inside the cube, and some well outside it
+    points = np.concatenate((rng.random((200, 3)) * 0.8 + np.array((0.1, 0.1, 0.2)), rng.random((20, 3)) * 3.0 - 1.0))
+    tetIndex, bary = embed_points(points, restPos, tetIds)
+    assert np.allclose(bary.sum(axis=1), 1.0)
+    assert (bary[:200] > -1e-9).all()
+    matrix = np.array(((1.2, 0.3, 0.0), (-0.2, 0.9, 0.1), (0.0, 0.4, 1.1)))
+    offset = np.array((0.5, -1.0, 2.0))
+    moved = deform_points(restPos @ matrix.T + offset, tetIds, tetIndex, bary)
+    assert np.allclose(moved, points @ matrix.T + offset, atol=1e-9)
+
+def per_edge_pass(solver, settings, sdt, order):
+    # The distance pass one edge at a time, as the solver did before colors
+    verts = solver.verts.copy()
+    alpha = 1.0 / settings.distanceStiffness / sdt / sdt
+    for i in order:
+        id0, id1 = solver.edgeIds[i]
+        vector = verts[id0] - verts[id1]
+        distance = np.sqrt(vector @ vector)
+        if distance < 0.000000000000001:
+            continue
+        displacement = vector / distance * (-(distance - solver.edgeLengths[i]) / alpha / settings.distanceMass) / settings.distanceDamping
+        verts[id0] += displacement
+        verts[id1] -= displacement
+    return verts
+
+def get_length_error(solver, verts):
+    vector = verts[solver.edgeIds[:, 0]] - verts[solver.edgeIds[:, 1]]
+    return np.abs(np.sqrt(np.einsum("ij,ij->i", vector, vector)) - solver.edgeLengths).max()
+
+def test_colored_edge_pass_matches_per_edge_gauss_seidel():
+    restPos, tetIds, edgeIds = make_cube_tets(3)
+    solver = Solver(restPos, tetIds, edgeIds)
+    solver.set_positions(restPos + np.random.default_rng(6).normal(0.0, 0.03, restPos.shape))
+    settings = Settings()
+    sdt = 1.0 / 72.0
+    # Edges one by one, color after color, is the same pass
+    colored = per_edge_pass(solver, settings, sdt, np.concatenate(solver.activeEdgeColors))
+    # In edge order it differs only by the order, the error left is close
+    plain = per_edge_pass(solver, settings, sdt, np.arange(len(solver.edgeIds)))
+    before = get_length_error(solver, solver.verts)
+    solver.solve_edges(sdt, settings)
+    assert np.allclose(solver.verts, colored, rtol=0.0, atol=1e-12)
+    assert get_length_error(solver, solver.verts) < 0.5 * before
+    assert abs(get_length_error(solver, solver.verts) - get_length_error(solver, plain)) < 0.25 * get_length_error(solver, plain)
+
+def relaxed_cube(pinned=False, **settings):
+    # One substep of passes on a perturbed cube, optionally with its bottom pinned
+    restPos, tetIds, edgeIds = make_cube_tets(3)
+    positions = restPos + np.random.default_rng(7).normal(0.0, 0.03, restPos.shape)
+    solver = Solver(restPos, tetIds, edgeIds)
+    solver.set_positions(positions)
+    if pinned:
+        solver.set_pin_weights((restPos[:, 2] == restPos[:, 2].min()).astype(np.float64))
+    solver.solve_constraints(1.0 / 72.0, Settings(**settings))
+    return solver, positions
+
+def test_relaxation_speeds_up_the_passes():
+    plain = relaxed_cube(distanceIterations=8, volumeIterations=8)[0]
+    # Unit omega is plain Gauss-Seidel, as is Chebyshev's first pass
+    sor = relaxed_cube(distanceIterations=8, volumeIterations=8, relaxation='SOR', omega=1.0)[0]
+    assert np.array_equal(sor.verts, plain.verts)
+    first = relaxed_cube(relaxation='CHEBYSHEV')[0]
+    single = relaxed_cube()[0]
+    assert np.array_equal(first.verts, single.verts)
+    # The same passes leave less error accelerated
+    sor = relaxed_cube(distanceIterations=8, volumeIterations=8, relaxation='SOR', omega=1.5)[0]
+    chebyshev = relaxed_cube(distanceIterations=8, volumeIterations=8, relaxation='CHEBYSHEV', spectralRadius=0.9)[0]
+    assert sor.get_edge_error() < 0.8 * plain.get_edge_error()
+    assert chebyshev.get_edge_error() < 0.8 * plain.get_edge_error()
+
+def test_relaxation_keeps_pinned_vertices():
+    restPos = make_cube_tets(3)[0]
+    pinned = restPos[:, 2] == restPos[:, 2].min()
+    for settings in ({'relaxation': 'SOR', 'omega': 1.5}, {'relaxation': 'CHEBYSHEV', 'spectralRadius': 0.9}):
+        solver, positions = relaxed_cube(pinned=True, distanceIterations=8, volumeIterations=8, **settings)
+        assert np.array_equal(solver.get_positions()[pinned], positions[pinned])
+
+def test_multigrid_levels_coarsen_the_mesh():
+    restPos, tetIds, edgeIds = make_cube_tets(6)
+    solver = Solver(restPos, tetIds, edgeIds)
+    solver.build_levels(0)
+    assert solver.get_level_count() == 0
+    # Coarsening stops once a level no longer shrinks
+    solver.build_levels(3)
+    assert solver.get_level_count() == 2
+    coarse = solver.coarse
+    assert coarse.vertCount < solver.vertCount
+    assert np.array_equal(np.bincount(solver.clusters, minlength=coarse.vertCount), solver.clusterCounts)
+    # Every vertex sits in a coarse tet at its rest position
+    assert np.allclose(deform_points(coarse.restPos, coarse.tetIds, solver.coarseTet, solver.coarseBary), solver.restPos)
+
+def stretched_cube(levels, iterations):
+    # A cube stretched up from its pinned bottom, after one substep of passes
+    restPos, tetIds, edgeIds = make_cube_tets(6)
+    positions = restPos * np.array((1.0, 1.0, 1.3))
+    solver = Solver(restPos, tetIds, edgeIds)
+    solver.set_positions(positions)
+    solver.set_pin_weights((restPos[:, 2] == restPos[:, 2].min()).astype(np.float64))
+    solver.build_levels(levels)
+    solver.solve_constraints(1.0 / 72.0, Settings(distanceIterations=iterations, volumeIterations=iterations, multigridLevels=levels))
+    return solver, positions
+
+def get_mean_length_error(solver):
+    vector = solver.verts[solver.edgeIds[:, 0]] - solver.verts[solver.edgeIds[:, 1]]
+    return np.abs(np.sqrt(np.einsum("ij,ij->i", vector, vector)) - solver.edgeLengths).mean()
+
+def test_multigrid_takes_out_the_stretch():
+    for iterations in (1, 4):
+        plain = stretched_cube(0, iterations)[0]
+        solver, positions = stretched_cube(2, iterations)
+        assert solver.get_level_count() == 2
+        # The coarse level takes out more of the error the passes spread slowly
+        assert get_mean_length_error(solver) < 0.8 * get_mean_length_error(plain)
+        assert solver.get_positions()[:, 2].max() < plain.get_positions()[:, 2].max()
+        # The prolonged correction leaves pinned vertices where they are
+        pinned = solver.pinnedVerts
+        assert np.array_equal(solver.verts[pinned], solver.to_internal(positions)[pinned])
+
+def test_multigrid_cube_rests_on_the_ground():
+    solver = drop_cube(n=4, frames=36, multigridLevels=1)
+    assert solver.get_level_count() == 1
+    positions = solver.get_positions()
+    assert np.abs(solver.verts - solver.previousPos).max() < 1e-3
+    restPos, tetIds, edgeIds = make_cube_tets(4, height=0.5)
+    volume = get_tet_volumes(positions, tetIds)
+    assert (volume > 0.0).all()
+    assert abs(volume.sum() / get_tet_volumes(restPos, tetIds).sum() - 1.0) < 0.05
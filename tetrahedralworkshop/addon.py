@@ -0,0 +1,2154 @@
+import bpy
+import hashlib
+import mathutils
+from mathutils.bvhtree import BVHTree
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .cache import PointCache, get_topology_key, load_rest, load_topology, save_rest, save_topology
+from .core import Settings, Solver, SpatialHash, StepStateSize, deform_points, embed_points
+from .profiling import Profile, write_csv, write_json
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+SoftBodyList = []
+
+# Set while playback runs, seeking is left to the playback handler then
+Playing = False
+# Set while seek() steps through frames, so the frame handlers stay out of it
+Seeking = False
+
+# Timings of the simulate handler itself, the bodies keep their own
+HandlerProfile = Profile("simulate handler")
+
+# Worker threads for parallel stepping, created on first use
+StepPool = None
+StepPoolWorkers = 0
+
+# Memory the checkpoints of one body may take, the oldest are dropped beyond it
+CheckpointMemory = 256 * 1024 * 1024
+
+# Keyframe keys by action pointer, dropped when the action is edited, see tag_action_updates
+ActionKeys = {}
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def open_cache(cache, vertCount):
+    # Writable when possible, read only storage like a shared render farm
+    # cache still plays back
+    try:
+        return cache.open(vertCount)
+    except OSError:
+        return cache.open(vertCount, writable=False)
+
+def get_output_name(obj):
+    # The shape key or attribute a soft body writes its positions to
+    return obj.tet_properties.outputName or "Tetrahedral Workshop"
+
+def get_output_shape_key(obj, name):
+    # Created on first use, relative to a basis holding the rest shape
+    if obj.data.shape_keys is None:
+        obj.shape_key_add(name="Basis", from_mix=False)
+    key = obj.data.shape_keys.key_blocks.get(name)
+    if key is None:
+        key = obj.shape_key_add(name=name, from_mix=False)
+    if key.value != 1.0:
+        key.value = 1.0
+    return key
+
+def get_output_attribute(obj, name):
+    # A point vector attribute, replaced when one of another type has the name
+    mesh = obj.data
+    attribute = mesh.attributes.get(name)
+    if attribute is not None and (attribute.data_type != 'FLOAT_VECTOR' or attribute.domain != 'POINT'):
+        mesh.attributes.remove(attribute)
+        attribute = None
+    if attribute is None:
+        attribute = mesh.attributes.new(name, 'FLOAT_VECTOR', 'POINT')
+    return attribute
+
+def write_mesh_output(obj, target, name, coords):
+    # (N * 3,) float32 coordinates in vertex order to the base mesh, a
+    # shape key or an attribute of obj, see TetProperties.outputTarget
+    mesh = obj.data
+    if target == 'SHAPE_KEY':
+        get_output_shape_key(obj, name).data.foreach_set("co", coords)
+        mesh.update_tag()
+    elif target == 'ATTRIBUTE':
+        get_output_attribute(obj, name).data.foreach_set("vector", coords)
+        mesh.update_tag()
+    else:
+        mesh.vertices.foreach_set("co", coords)
+
+def is_deforming(obj):
+    # Without shape keys or deforming modifiers the evaluated geometry is
+    # the mesh data itself, which only changes when the object is edited.
+    # The basis and the shape key a soft body writes its own output to
+    # leave the mesh as the simulation put it, so they do not count.
+    keys = obj.data.shape_keys
+    if keys is not None:
+        if not keys.use_relative:
+            return True
+        ignored = {keys.reference_key.name}
+        if obj.tet_properties.outputTarget == 'SHAPE_KEY':
+            ignored.add(get_output_name(obj))
+        for i in keys.key_blocks:
+            if i.name not in ignored and not i.mute:
+                return True
+    for i in obj.modifiers:
+        if i.type != 'COLLISION' and i.show_viewport:
+            return True
+    return False
+
+def get_digest(array):
+    # Hash of an array's contents that is the same in every session, unlike
+    # hash(), so keys built from it can be written to files
+    return hashlib.blake2b(np.ascontiguousarray(array).tobytes(), digest_size=8).hexdigest()
+
+def get_fcurves(action):
+    # Layered actions keep their curves in channel bags
+    if hasattr(action, "fcurves"):
+        return list(action.fcurves)
+    return [fcurve for layer in action.layers for strip in layer.strips for bag in strip.channelbags for fcurve in bag.fcurves]
+
+def get_action_key(idBlock):
+    # The keyframes animating idBlock, None when it has none. Read once per
+    # action and kept until the action is edited.
+    anim = idBlock.animation_data if idBlock is not None else None
+    if anim is None or anim.action is None:
+        return None
+    key = ActionKeys.get(anim.action.as_pointer())
+    if key is None:
+        key = []
+        for fcurve in get_fcurves(anim.action):
+            points = np.empty((3, len(fcurve.keyframe_points) * 2), dtype=np.float32)
+            for i, name in enumerate(("co", "handle_left", "handle_right")):
+                fcurve.keyframe_points.foreach_get(name, points[i])
+            key.append((fcurve.data_path, fcurve.array_index, fcurve.mute, get_digest(points)))
+        key = tuple(key)
+        ActionKeys[anim.action.as_pointer()] = key
+    return key
+
+def tag_action_updates(depsgraph):
+    # Editing keyframes updates the action, playback does not
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Action):
+            ActionKeys.pop(update.id.original.as_pointer(), None)
+
+def get_mesh_key(mesh):
+    # Changes when the mesh is edited
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+    return (len(mesh.polygons), get_digest(coords))
+
+def get_motion_key(obj, visited=None):
+    # What moves or deforms obj over time, the same on every frame: its
+    # keyframes, or its transform when it has none, and the same for its
+    # parent and the objects its modifiers follow. Objects go by name, so the
+    # key holds across sessions.
+    if visited is None:
+        visited = set()
+    if obj is None or obj.as_pointer() in visited:
+        return None
+    visited.add(obj.as_pointer())
+    actionKey = get_action_key(obj)
+    if actionKey is None:
+        actionKey = tuple(tuple(row) for row in obj.matrix_basis)
+    shapeKeys = obj.data.shape_keys if obj.type == 'MESH' else None
+    key = [obj.name, actionKey, tuple(tuple(row) for row in obj.matrix_parent_inverse), get_action_key(shapeKeys), get_motion_key(obj.parent, visited)]
+    for i in obj.modifiers:
+        if i.show_viewport:
+            key.append((i.name, get_motion_key(getattr(i, "object", None), visited)))
+    return tuple(key)
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class Collider:
+    def __init__(self, obj):
+        #-------------------------------------------------------------------
+        # Initialize object
+        self.obj = obj
+        # Initialize BVHTree, built in object local space
+        self.bvhTree = None
+        # Initialize geometry key, the evaluated coordinates the tree was built from
+        self.geometryKey = None
+        # Initialize geometry dirty flag, set when the object was edited
+        self.geometryDirty = True
+        # Initialize world matrix and the inverse / normal matrices derived from it
+        self.matrix = None
+        self.matrixInv = None
+        self.normalMatrix = None
+        # Initialize local bounds, (2, 3) min / max of the evaluated coordinates
+        self.localBounds = None
+        # Initialize world bounds, (2, 3) axis aligned box used for culling
+        self.bounds = None
+        # Initialize local limit scale, turns a world distance into a safe local one
+        self.localLimitScale = 1.0
+        # Initialize moved flag, set when the last update changed the tree or the transform
+        self.moved = True
+        # Initialize mesh key, get_mesh_key of the original mesh, None until read after an edit
+        self.meshKey = None
+        #-------------------------------------------------------------------
+    
+    def update(self, depsgraph):
+        evalObj = self.obj.evaluated_get(depsgraph)
+        self.moved = False
+        if self.geometryDirty or self.bvhTree is None or is_deforming(self.obj):
+            mesh = evalObj.to_mesh()
+            coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", coords)
+            geometryKey = (len(mesh.polygons), coords)
+            # Rebuild only when the evaluated geometry actually changed
+            if self.geometryKey is None or self.geometryKey[0] != geometryKey[0] or not np.array_equal(self.geometryKey[1], coords):
+                mesh.calc_loop_triangles()
+                tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+                mesh.loop_triangles.foreach_get("vertices", tris)
+                self.bvhTree = BVHTree.FromPolygons(coords.reshape(-1, 3).tolist(), tris.reshape(-1, 3).tolist())
+                self.geometryKey = geometryKey
+                self.moved = True
+                if len(coords):
+                    self.localBounds = np.array((coords.reshape(-1, 3).min(axis=0), coords.reshape(-1, 3).max(axis=0)))
+                else:
+                    self.localBounds = None
+                self.matrix = None
+            evalObj.to_mesh_clear()
+            self.geometryDirty = False
+        # A moved collider keeps its tree, only the transforms are refreshed
+        if self.matrix is None or self.matrix != evalObj.matrix_world:
+            self.matrix = evalObj.matrix_world.copy()
+            self.moved = True
+            self.matrixInv = np.array(self.matrix.inverted_safe())
+            self.normalMatrix = self.matrixInv[:3, :3].T
+            self.localLimitScale = np.linalg.norm(self.matrixInv[:3, :3], 2)
+            self.bounds = None
+            if self.localBounds is not None:
+                corners = np.array([(x, y, z) for x in self.localBounds[:, 0] for y in self.localBounds[:, 1] for z in self.localBounds[:, 2]])
+                matrix = np.array(self.matrix)
+                corners = corners @ matrix[:3, :3].T + matrix[:3, 3]
+                self.bounds = np.array((corners.min(axis=0), corners.max(axis=0)))
+    
+    def get_mesh_key(self):
+        if self.meshKey is None:
+            self.meshKey = get_mesh_key(self.obj.data)
+        return self.meshKey
+    
+    def cull(self, lo, hi, radius):
+        # Rows whose (lo, hi) box comes within radius of the collider bounds
+        if self.bounds is None:
+            return np.zeros(len(lo), dtype=bool)
+        return ((lo <= self.bounds[1] + radius) & (hi >= self.bounds[0] - radius)).all(axis=1)
+    
+    def find_nearest_batch(self, points, radius, locations, normals, distances):
+        # Narrow phase for (M, 3) world points: the tree is queried in local
+        # space, hits closer than the ones already in distances are kept.
+        candidates = np.flatnonzero(self.cull(points, points, radius))
+        if not len(candidates):
+            return
+        local = points[candidates] @ self.matrixInv[:3, :3].T + self.matrixInv[:3, 3]
+        limit = radius * self.localLimitScale
+        found = []
+        hits = []
+        for i, co in enumerate(local.tolist()):
+            location, normal, index, distance = self.bvhTree.find_nearest(co, limit)
+            if location is not None:
+                found.append(i)
+                hits.append((*location, *normal))
+        if not found:
+            return
+        candidates = candidates[found]
+        hits = np.array(hits, dtype=np.float64)
+        matrix = np.array(self.matrix)
+        location = hits[:, :3] @ matrix[:3, :3].T + matrix[:3, 3]
+        normal = hits[:, 3:] @ self.normalMatrix.T
+        normal /= np.maximum(np.sqrt(np.einsum("ij,ij->i", normal, normal)), 0.000000000000001)[:, None]
+        vector = location - points[candidates]
+        distance = np.sqrt(np.einsum("ij,ij->i", vector, vector))
+        closer = distance < distances[candidates]
+        candidates = candidates[closer]
+        locations[candidates] = location[closer]
+        normals[candidates] = normal[closer]
+        distances[candidates] = distance[closer]
+
+class ColliderRegistry:
+    def __init__(self):
+        # Initialize colliders, keyed by object pointer
+        self.colliders = {}
+        # Initialize dirty flag, set when the scene may have gained or lost colliders
+        self.dirty = True
+        # Initialize frame the colliders were last updated for
+        self.frame = None
+    
+    def refresh(self, scene):
+        colliders = {}
+        for i in scene.objects:
+            if i.type == 'MESH':
+                for j in i.modifiers:
+                    if j.type == 'COLLISION':
+                        key = i.as_pointer()
+                        colliders[key] = self.colliders.get(key) or Collider(i)
+                        break
+        self.colliders = colliders
+    
+    def update(self, scene, depsgraph):
+        # Once per frame, shared by every soft body
+        if not self.dirty and self.frame == scene.frame_current:
+            return
+        if self.dirty:
+            self.refresh(scene)
+            self.dirty = False
+        self.frame = scene.frame_current
+        for i in self.colliders.values():
+            i.update(depsgraph)
+    
+    def tag_updates(self, depsgraph):
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                self.dirty = True
+                collider = self.colliders.get(update.id.original.as_pointer())
+                if collider is not None and update.is_updated_geometry:
+                    collider.geometryDirty = True
+                    collider.meshKey = None
+            elif isinstance(update.id, (bpy.types.Collection, bpy.types.Scene)):
+                self.dirty = True
+    
+    def cull(self, start, end, radius):
+        # Broadphase: the swept box of every point (start to end) against the
+        # collider bounds grown by radius, after a whole-body box test.
+        lo = np.minimum(start, end)
+        hi = np.maximum(start, end)
+        candidates = np.zeros(len(start), dtype=bool)
+        if not len(start):
+            return candidates
+        bodyLo = lo.min(axis=0)[None]
+        bodyHi = hi.max(axis=0)[None]
+        for i in self.colliders.values():
+            if i.cull(bodyLo, bodyHi, radius)[0]:
+                candidates |= i.cull(lo, hi, radius)
+        return candidates
+    
+    def get_static_key(self, scene, depsgraph):
+        # Which colliders there are and where they are, None while any of
+        # them deforms or was edited. Only reads, so it is safe to call while
+        # a worker steps against the registry.
+        key = []
+        for i in scene.objects:
+            if i.type == 'MESH' and any(j.type == 'COLLISION' for j in i.modifiers):
+                collider = self.colliders.get(i.as_pointer())
+                if collider is None or collider.geometryDirty or is_deforming(i):
+                    return None
+                key.append((i.as_pointer(), tuple(tuple(row) for row in i.evaluated_get(depsgraph).matrix_world)))
+        return tuple(key)
+    
+    def get_motion_key(self, scene):
+        # Which colliders there are, their meshes and what moves them. Unlike
+        # the static key it stays the same from frame to frame, so it tells
+        # whether states simulated earlier still hold.
+        key = []
+        for i in scene.objects:
+            if i.type == 'MESH' and any(j.type == 'COLLISION' for j in i.modifiers):
+                collider = self.colliders.get(i.as_pointer())
+                meshKey = collider.get_mesh_key() if collider is not None else get_mesh_key(i.data)
+                key.append((meshKey, get_motion_key(i)))
+        return tuple(key)
+    
+    def moved_near(self, lo, hi, radius):
+        # Whether a collider that moved in the last update comes within radius of the box
+        for i in self.colliders.values():
+            if i.moved and i.cull(lo[None], hi[None], radius)[0]:
+                return True
+        return False
+    
+    def find_nearest_batch(self, points, radius):
+        # Nearest hit within radius over all colliders for (M, 3) world points.
+        # Misses keep an infinite distance.
+        locations = np.zeros((len(points), 3), dtype=np.float64)
+        normals = np.zeros((len(points), 3), dtype=np.float64)
+        distances = np.full(len(points), np.inf, dtype=np.float64)
+        for i in self.colliders.values():
+            i.find_nearest_batch(points, radius, locations, normals, distances)
+        return locations, normals, distances
+
+Colliders = ColliderRegistry()
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class SoftBody:
+    def __init__(self, obj):
+        #-------------------------------------------------------------------
+        # Initialize object
+        self.obj = obj
+        # Initialize edge count array
+        self.edgeCount = len(self.obj.data.edges)
+        # Initialize vert count array
+        self.vertCount = len(self.obj.data.vertices)
+        # Initialize pin key, the (group name, group index) the weights were read from
+        self.pinKey = None
+        # Initialize evaluated coordinates buffer, (N * 3,) float32 reused every frame
+        self.evalCoords = np.empty(self.vertCount * 3, dtype=np.float32)
+        # Initialize point cache, the memory-mapped bake of this body
+        self.pointCache = None
+        # Initialize state cache, the full states the bake stored at every checkpoint interval
+        self.stateCache = None
+        # Initialize checkpoints, frame -> (positions, previous positions, step state) after that frame, oldest first
+        self.checkpoints = {}
+        # Initialize settings key, the tet_properties, pins, colliders and motion the checkpoints were made with
+        self.settingsKey = None
+        # Initialize last frame, the frame the current state belongs to
+        self.lastFrame = None
+        # Initialize profile, per phase timings of the latest frames
+        self.profile = Profile(obj.name)
+        # Initialize pin sample, the evaluated pinned positions of the last read
+        self.pinSample = None
+        # Initialize embed target, the mesh object deformed by this body, and its rest coordinates
+        self.embedTarget = None
+        self.embedRest = None
+        # Initialize embed binding, (M,) tet index and (M, 4) barycentric coordinates per target vertex
+        self.embedTet = None
+        self.embedBary = None
+        # Initialize embed output, the (target, name) the embed target was last written to
+        self.embedOutput = None
+        # Initialize matrix, the (4, 4) world matrix read for the frame being simulated, the last one until then
+        self.matrix = np.eye(4)
+        # Initialize output buffer, (N * 3,) float32 the positions are written from every frame
+        self.outputBuffer = np.empty(self.vertCount * 3, dtype=np.float32)
+        # Initialize output key, the (target, name) the last positions went to
+        self.outputKey = None
+        #-------------------------------------------------------------------
+        # Store rest position
+        mesh = self.obj.data
+        coords = np.empty(self.vertCount * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coords)
+        # A baked body is rebuilt from the rest shape the bake was made from,
+        # by now the base mesh may hold a baked frame
+        if self.obj.tet_properties.cache == 'BAKED':
+            rest = load_rest(self.get_rest_path(), self.vertCount)
+            if rest is not None:
+                coords = rest
+        # Store polygon loops, every 4 vertex polygon is a tet
+        loopTotals = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loopTotals)
+        loopStarts = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loopStarts)
+        loops = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loops)
+        # Store edge ID:s
+        edges = np.empty(self.edgeCount * 2, dtype=np.int32)
+        mesh.edges.foreach_get("vertices", edges)
+        # Initialize topology key, a hash of the connectivity the topology cache is checked
+        # against. The coordinates stay out of it, they are the last simulated
+        # positions whenever the base mesh is the output.
+        self.topologyKey = get_topology_key(loopTotals, loops, edges)
+        # Initialize rest coordinates, (N * 3,) float32 as read from the base mesh
+        self.restCoords = coords
+        # Initialize solver, all the simulation state lives in there
+        topology = load_topology(self.get_topology_path(), self.topologyKey)
+        if topology is not None:
+            self.solver = Solver(coords.reshape(-1, 3), topology["tetIds"], topology["edgeIds"], topology)
+        else:
+            tetIds = loops[loopStarts[loopTotals == 4][:, None] + np.arange(4)]
+            self.solver = Solver(coords.reshape(-1, 3), tetIds, edges.reshape(-1, 2))
+            try:
+                save_topology(self.get_topology_path(), self.topologyKey, self.solver.get_topology())
+            except OSError:
+                # Only a slower start next time
+                pass
+        # Store pin weights
+        self.update_pin_weights()
+        #-------------------------------------------------------------------
+    
+    #-----------------------------------------------------------------------
+    # State accessors, see Solver for the array layouts.
+    
+    def get_positions(self):
+        return self.solver.get_positions()
+    
+    def set_positions(self, positions):
+        self.solver.set_positions(positions)
+    
+    def get_previous_positions(self):
+        return self.solver.get_previous_positions()
+    
+    def set_previous_positions(self, positions):
+        self.solver.set_previous_positions(positions)
+    
+    def get_rest_positions(self):
+        return self.solver.get_rest_positions()
+    
+    def get_pin_weights(self):
+        return self.solver.get_pin_weights()
+    
+    def get_inverse_masses(self):
+        return self.solver.get_inverse_masses()
+    
+    def set_inverse_masses(self, invMass):
+        self.solver.set_inverse_masses(invMass)
+    
+    def get_settings(self):
+        props = self.obj.tet_properties
+        return Settings(
+            substeps=props.substeps,
+            distanceIterations=props.distanceIterations,
+            volumeIterations=props.volumeIterations,
+            collisionIterations=props.collisionIterations,
+            pinIterations=props.pinIterations,
+            distanceMass=props.distanceMass * float(props.distanceMassE),
+            distanceStiffness=props.distanceStiffness * float(props.distanceStiffnessE),
+            distanceDamping=props.distanceDamping * float(props.distanceDampingE),
+            volumeStiffness=props.volumeStiffness * float(props.volumeStiffnessE),
+            volumeDamping=props.volumeDamping * float(props.volumeDampingE),
+            collisionRadius=props.collisionRadius,
+            friction=props.friction,
+            selfCollision=props.selfCollision,
+            sleepThreshold=props.sleepThreshold if props.sleep else 0.0,
+            sleepFrames=props.sleepFrames,
+            adaptiveSubsteps=props.adaptiveSubsteps,
+            minSubsteps=props.minSubsteps,
+            maxSubsteps=max(props.minSubsteps, props.maxSubsteps),
+            targetStrain=props.targetStrain,
+            tolerance=props.tolerance,
+            relaxation=props.relaxation,
+            omega=props.omega,
+            spectralRadius=props.spectralRadius,
+            multigridLevels=props.multigridLevels,
+            coarsening=props.coarsening
+        )
+    
+    #-----------------------------------------------------------------------
+    
+    def get_pin_key(self):
+        group = self.obj.vertex_groups.get(self.obj.tet_properties.pinGroup)
+        return (self.obj.tet_properties.pinGroup, group.index if group else -1)
+    
+    def update_pin_weights(self, force=False):
+        # Read the pin group into per-vertex weights in one pass over the mesh,
+        # only when the group changed. The solver derives its masks from it.
+        group = self.obj.vertex_groups.get(self.obj.tet_properties.pinGroup)
+        pinKey = self.get_pin_key()
+        if pinKey == self.pinKey and not force:
+            return
+        self.pinKey = pinKey
+        pinWeights = np.zeros(self.vertCount, dtype=np.float64)
+        if group is not None:
+            for vert in self.obj.data.vertices:
+                for element in vert.groups:
+                    if element.group == group.index:
+                        pinWeights[vert.index] = element.weight
+        self.solver.set_pin_weights(pinWeights)
+    
+    def reset_position(self):
+        # Pick up weights painted since the last run
+        self.update_pin_weights(force=True)
+        self.solver.reset()
+        self.write_positions()
+        # The rest state comes before the first simulated frame
+        self.lastFrame = bpy.context.scene.frame_start - 1
+        return
+    
+    def write_positions(self, verts=None):
+        # The solver's positions, or other ones in its internal order
+        if verts is None:
+            verts = self.solver.verts
+        # Scattered into vertex order straight in the float32 buffer, no
+        # list and no new array on the way to foreach_set
+        self.outputBuffer.reshape(-1, 3)[self.solver.order] = verts
+        self.write_output(self.outputBuffer)
+        self.write_embedded(verts)
+    
+    def write_output(self, coords):
+        # (N * 3,) float32 coordinates in vertex order to the output target
+        self.update_output_target()
+        write_mesh_output(self.obj, self.obj.tet_properties.outputTarget, get_output_name(self.obj), coords)
+    
+    def update_output_target(self):
+        # A body that stops writing to the base mesh gives it its rest shape back
+        props = self.obj.tet_properties
+        outputKey = (props.outputTarget, props.outputName)
+        if outputKey == self.outputKey:
+            return
+        if self.outputKey is not None and self.outputKey[0] == 'BASE' and props.outputTarget != 'BASE':
+            self.obj.data.vertices.foreach_set("co", self.restCoords)
+        self.outputKey = outputKey
+    
+    #-----------------------------------------------------------------------
+    # Embedded mesh
+    
+    def update_embedding(self):
+        # Bind the embed target once, rebinding when it is changed or its
+        # vertex count is. A target that was let go gets its rest shape back.
+        # Unless the body writes to the base mesh, the target's base mesh is
+        # left alone, so it still holds the rest shape to bind from after
+        # the file is saved and opened again.
+        target = self.obj.tet_properties.embedTarget
+        if target is not None and (target.type != 'MESH' or target == self.obj):
+            target = None
+        if target == self.embedTarget and (target is None or len(target.data.vertices) * 3 == len(self.embedRest)):
+            return
+        if self.embedTarget is not None and self.embedTarget.name in bpy.data.objects and self.embedOutput is not None:
+            if len(self.embedTarget.data.vertices) * 3 == len(self.embedRest):
+                write_mesh_output(self.embedTarget, *self.embedOutput, self.embedRest)
+                self.embedTarget.data.update()
+        self.embedTarget = target
+        self.embedOutput = None
+        if target is None:
+            self.embedRest = None
+            self.embedTet = None
+            self.embedBary = None
+            return
+        self.embedRest = np.empty(len(target.data.vertices) * 3, dtype=np.float32)
+        target.data.vertices.foreach_get("co", self.embedRest)
+        # Bound in the body's space, with the objects where they are now
+        matrix = np.linalg.inv(np.array(self.obj.matrix_world)) @ np.array(target.matrix_world)
+        points = self.embedRest.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        self.embedTet, self.embedBary = embed_points(points, self.solver.restPos, self.solver.tetIds)
+    
+    def write_embedded(self, verts=None):
+        self.update_embedding()
+        if self.embedTarget is None:
+            return
+        points = deform_points(self.solver.verts if verts is None else verts, self.solver.tetIds, self.embedTet, self.embedBary)
+        matrix = np.linalg.inv(np.array(self.embedTarget.matrix_world)) @ np.array(self.obj.matrix_world)
+        points = points @ matrix[:3, :3].T + matrix[:3, 3]
+        # The same kind of output as the body, a target that stops getting
+        # its base mesh written gives it its rest shape back
+        output = (self.obj.tet_properties.outputTarget, get_output_name(self.obj))
+        if self.embedOutput is not None and self.embedOutput[0] == 'BASE' and output[0] != 'BASE':
+            self.embedTarget.data.vertices.foreach_set("co", self.embedRest)
+        self.embedOutput = output
+        write_mesh_output(self.embedTarget, *output, points.astype(np.float32).ravel())
+        self.embedTarget.data.update()
+    #-----------------------------------------------------------------------
+    
+    #-----------------------------------------------------------------------
+    # Checkpoints
+    
+    def get_settings_key(self):
+        props = self.obj.tet_properties
+        settingsKey = tuple(getattr(props, name) for name in props.bl_rna.properties.keys() if name not in ('rna_type', 'cache', 'cacheDirectory', 'checkpointInterval', 'profiling', 'embedTarget', 'outputTarget', 'outputName', 'isSoftBody'))
+        return settingsKey + self.get_pin_key()
+    
+    def get_scene_key(self):
+        # Settings plus what the frames depend on beyond them: the colliders
+        # and what moves the body and its pin drivers
+        return (self.get_settings_key(), Colliders.get_motion_key(bpy.context.scene), get_motion_key(self.obj))
+    
+    def get_state_key(self):
+        # get_scene_key as one int64, stored with every bake state
+        return int(np.frombuffer(hashlib.blake2b(repr(self.get_scene_key()).encode(), digest_size=8).digest(), dtype=np.int64)[0])
+    
+    def update_settings_key(self):
+        # Checkpoints made with other settings, pins or colliders, or while
+        # something moved differently, would replay wrongly
+        settingsKey = self.get_scene_key()
+        if settingsKey != self.settingsKey:
+            self.settingsKey = settingsKey
+            self.checkpoints.clear()
+            return True
+        return False
+    
+    def store_checkpoint(self, frame, verts=None, previousPos=None, stepState=None):
+        # The solver's state, or another one in its internal order
+        interval = self.obj.tet_properties.checkpointInterval
+        if interval > 0 and (frame - bpy.context.scene.frame_start) % interval == 0:
+            if verts is None:
+                verts, previousPos, stepState = self.solver.verts, self.solver.previousPos, self.solver.get_step_state()
+            self.add_checkpoint(frame, verts.copy(), previousPos.copy(), stepState.copy())
+    
+    def add_checkpoint(self, frame, verts, previousPos, stepState):
+        # Dropping the oldest checkpoints keeps them within CheckpointMemory
+        self.checkpoints.pop(frame, None)
+        self.checkpoints[frame] = (verts, previousPos, stepState)
+        limit = max(2, CheckpointMemory // max(1, verts.nbytes + previousPos.nbytes))
+        while len(self.checkpoints) > limit:
+            del self.checkpoints[next(iter(self.checkpoints))]
+    
+    def restore_checkpoint(self, frame):
+        # Bring the state to the nearest stored frame at or before frame, the
+        # current state counts when it is closer. Returns the restored frame.
+        self.update_pin_weights()
+        self.update_settings_key()
+        frameStart = bpy.context.scene.frame_start
+        frames = [f for f in self.checkpoints if frameStart <= f <= frame]
+        # States stored by the bake count as checkpoints, read when they are
+        # the nearest. States simulated with other settings are skipped.
+        stored = self.get_latest_state(frame)
+        if stored is not None and stored >= frameStart and (not frames or stored > max(frames)):
+            self.add_checkpoint(stored, *self.read_state(stored))
+            frames.append(stored)
+        if self.lastFrame is not None and frameStart - 1 <= self.lastFrame <= frame:
+            if not frames or self.lastFrame >= max(frames):
+                return self.lastFrame
+        if not frames:
+            self.reset_position()
+            return self.lastFrame
+        self.lastFrame = max(frames)
+        verts, previousPos, stepState = self.checkpoints[self.lastFrame]
+        self.solver.verts[:] = verts
+        self.solver.previousPos[:] = previousPos
+        self.solver.currentPos[:] = previousPos
+        self.solver.set_step_state(stepState)
+        # The next frame starts from the evaluated mesh, so it has to match
+        self.write_positions()
+        return self.lastFrame
+    #-----------------------------------------------------------------------
+    
+    #-----------------------------------------------------------------------
+    # Bake cache
+    
+    def get_cache_directory(self):
+        directory = self.obj.tet_properties.cacheDirectory
+        if directory.startswith("//") and not bpy.data.filepath:
+            directory = os.path.join(bpy.app.tempdir, directory[2:])
+        return bpy.path.abspath(directory)
+    
+    def get_cache_path(self):
+        return os.path.join(self.get_cache_directory(), bpy.path.clean_name(self.obj.name) + ".tetcache")
+    
+    def get_state_cache_path(self):
+        return os.path.join(self.get_cache_directory(), bpy.path.clean_name(self.obj.name) + ".tetstate")
+    
+    def get_rest_path(self):
+        return os.path.join(self.get_cache_directory(), bpy.path.clean_name(self.obj.name) + ".tetrest.npy")
+    
+    def get_topology_path(self):
+        # One file per object, a new topology replaces the old one
+        return os.path.join(self.get_cache_directory(), bpy.path.clean_name(self.obj.name) + ".tettopo.npz")
+    
+    def get_point_cache(self):
+        # Mapped lazily, and again whenever the cache path changes
+        path = self.get_cache_path()
+        if self.pointCache is None or self.pointCache.path != path:
+            if self.pointCache is not None:
+                self.pointCache.close()
+            self.pointCache = PointCache(path)
+            open_cache(self.pointCache, self.vertCount)
+        return self.pointCache
+    
+    def get_state_rows(self):
+        # Positions and previous positions in float64, viewed as four float32
+        # rows per vertex, then the step state, two float32 rows per 3
+        # values, and two rows holding the state key
+        return 4 * self.vertCount + 2 * StepStateSize // 3 + 2
+    
+    def get_state_cache(self):
+        # The full solver state of stored frames, so a frame simulated from
+        # them matches the bake, see get_state_rows
+        path = self.get_state_cache_path()
+        if self.stateCache is None or self.stateCache.path != path:
+            if self.stateCache is not None:
+                self.stateCache.close()
+            self.stateCache = PointCache(path)
+            open_cache(self.stateCache, self.get_state_rows())
+        return self.stateCache
+    
+    def write_state(self, frame, stateKey):
+        key = np.zeros(3, dtype=np.int64)
+        key[0] = stateKey
+        state = np.concatenate((self.solver.get_positions(), self.solver.get_previous_positions(), self.solver.get_step_state().reshape(-1, 3), key.view(np.float64)[None]))
+        self.stateCache.write_frame(frame, state.view(np.float32).reshape(-1, 3))
+    
+    def read_state(self, frame):
+        # (positions, previous positions, step state), positions in the solver's internal order
+        state = np.ascontiguousarray(self.stateCache.read_frame(frame)).reshape(-1).view(np.float64)
+        positions = state[:6 * self.vertCount].reshape(-1, 3)
+        return self.solver.to_internal(positions[:self.vertCount]), self.solver.to_internal(positions[self.vertCount:]), state[6 * self.vertCount:6 * self.vertCount + StepStateSize].copy()
+    
+    def get_latest_state(self, frame):
+        # The last stored state at or before frame made with the current
+        # state key, None without one. Only the key rows are read.
+        states = self.get_state_cache()
+        stored = states.get_latest_frame(frame)
+        if stored is None:
+            return None
+        stateKey = self.get_state_key()
+        while stored is not None and np.ascontiguousarray(states.read_frame(stored)[-2:]).reshape(-1).view(np.int64)[0] != stateKey:
+            stored = states.get_latest_frame(stored - 1)
+        return stored
+    
+    def is_baked(self, frame):
+        return self.obj.tet_properties.cache == 'BAKED' and self.get_point_cache().has_frame(frame)
+    
+    def load_baked_frame(self, frame):
+        # The cached frame is float32 in vertex order, so it goes to the mesh as is
+        positions = self.pointCache.read_frame(frame)
+        self.write_output(positions.ravel())
+        self.solver.verts[:] = self.solver.to_internal(positions)
+        self.write_embedded()
+        # Positions only, the previous positions of this frame are unknown
+        self.lastFrame = None
+        self.solver.wake()
+    
+    def delete_bake(self):
+        self.get_point_cache().delete()
+        self.pointCache = None
+        if os.path.isfile(self.get_rest_path()):
+            os.remove(self.get_rest_path())
+        self.get_state_cache().delete()
+        self.stateCache = None
+        self.obj.tet_properties.cache = 'None'
+    #-----------------------------------------------------------------------
+    
+    def read_evaluated_positions(self):
+        # Only pinned vertices follow the evaluated mesh (armature, shape keys),
+        # the others keep the simulated positions that went into the mesh.
+        # Without anything deforming the mesh there is nothing to read.
+        # Returns how far the pinned vertices moved since the last read.
+        if not len(self.solver.pinVerts) or not is_deforming(self.obj):
+            self.pinSample = None
+            return 0.0
+        evalMesh = self.obj.evaluated_get(bpy.context.evaluated_depsgraph_get()).data
+        if len(evalMesh.vertices) != self.vertCount:
+            return 0.0
+        evalMesh.vertices.foreach_get("co", self.evalCoords)
+        pinVerts = self.solver.pinVerts
+        sample = self.evalCoords.reshape(-1, 3)[self.solver.order[pinVerts]]
+        self.solver.verts[pinVerts] = sample
+        motion = math.inf
+        if self.pinSample is not None and self.pinSample.shape == sample.shape:
+            moved = sample - self.pinSample
+            motion = float(np.sqrt(np.einsum("ij,ij->i", moved, moved).max()))
+        self.pinSample = sample
+        return motion
+    
+    def crazyspace(self):
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        scene = bpy.context.scene
+        self.obj.crazyspace_eval(depsgraph, scene)
+    
+    #-----------------------------------------------------------------------
+    # A simulated frame is prepare_frame, step_frame and finish_frame. Only
+    # step_frame stays clear of bpy, so it is the part that may run on a
+    # worker thread.
+    
+    def prepare_frame(self):
+        profile = self.profile
+        profile.enabled = self.obj.tet_properties.profiling
+        profile.begin(bpy.context.scene.frame_current)
+        
+        #self.crazyspace()
+        with profile.phase("settings"):
+            self.update_pin_weights()
+            settingsChanged = self.update_settings_key()
+        with profile.phase("read"):
+            pinMotion = self.read_evaluated_positions()
+        with profile.phase("colliders"):
+            Colliders.update(bpy.context.scene, bpy.context.evaluated_depsgraph_get())
+        # Colliders are in world space, the positions in object space
+        matrix = np.array(self.obj.matrix_world, dtype=np.float64)
+        transformed = not np.array_equal(matrix, self.matrix)
+        self.matrix = matrix
+        settings = self.get_settings()
+        if self.solver.sleeping:
+            self.update_sleep(settings, settingsChanged, pinMotion, transformed)
+        return settings
+    
+    def update_sleep(self, settings, settingsChanged, pinMotion, transformed):
+        # Wake on anything that could move a resting body: new settings, a
+        # moving pin driver, its own transform changing or a collider that
+        # moved near it
+        if settingsChanged or transformed or settings.sleepThreshold <= 0.0 or pinMotion >= settings.sleepThreshold:
+            self.solver.wake()
+            return
+        lo, hi = self.get_bounds(self.matrix)
+        if Colliders.moved_near(lo, hi, 2.0 * settings.collisionRadius):
+            self.solver.wake()
+    
+    def get_bounds(self, matrix=None):
+        # (lo, hi) box of the current positions, in world space when given the world matrix
+        verts = self.solver.verts
+        if matrix is not None:
+            verts = verts @ matrix[:3, :3].T + matrix[:3, 3]
+        if not len(verts):
+            return np.zeros(3), np.zeros(3)
+        return verts.min(axis=0), verts.max(axis=0)
+    
+    def step_frame(self, dt, gravity, settings, obstacles=None):
+        self.solver.step(dt, gravity, settings, Colliders, self.profile, obstacles, self.matrix)
+    
+    def finish_frame(self):
+        profile = self.profile
+        with profile.phase("writeback"):
+            self.write_positions()
+        
+        self.lastFrame = bpy.context.scene.frame_current
+        with profile.phase("checkpoint"):
+            self.store_checkpoint(self.lastFrame)
+        
+        #self.obj.crazyspace_eval_clear()
+        profile.end()
+    
+    def simulate(self, dt, gravity):
+        self.step_frame(dt, gravity, self.prepare_frame())
+        self.finish_frame()
+    
+    def can_simulate_ahead(self):
+        # Pins driven by a deforming mesh are only known once their frame is evaluated
+        return not (len(self.solver.pinVerts) and is_deforming(self.obj))
+    
+    def finish_ahead_frame(self, frame, verts, previousPos, stepState):
+        # A frame simulated ahead goes to the mesh like one simulated now
+        profile = self.profile
+        profile.enabled = self.obj.tet_properties.profiling
+        profile.begin(frame)
+        with profile.phase("writeback"):
+            self.write_positions(verts)
+        
+        self.lastFrame = frame
+        with profile.phase("checkpoint"):
+            self.store_checkpoint(frame, verts, previousPos, stepState)
+        profile.end()
+    #-----------------------------------------------------------------------
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def get_step_pool(workers):
+    global StepPool, StepPoolWorkers
+    workers = workers or os.cpu_count() or 1
+    if StepPool is None or StepPoolWorkers != workers:
+        if StepPool is not None:
+            StepPool.shutdown()
+        StepPool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tetrahedralworkshop")
+        StepPoolWorkers = workers
+    return StepPool
+
+def shutdown_step_pool():
+    global StepPool, StepPoolWorkers
+    if StepPool is not None:
+        StepPool.shutdown()
+    StepPool = None
+    StepPoolWorkers = 0
+
+def get_colliding_bodies(bodies):
+    # (body, world matrix, collision radius) of every body with body
+    # collisions, read from Blender once so the rest can run off the main thread
+    return [(i, np.array(i.obj.matrix_world, dtype=np.float64), i.obj.tet_properties.collisionRadius) for i in bodies if i.obj.tet_properties.bodyCollision]
+
+def get_body_obstacles(colliding):
+    # World space snapshot of every body with body collisions, taken before
+    # any of them steps. One hash holds all of them, every body skips its
+    # own points by owner id. Returns body -> (hash, owner, matrix).
+    spacing = 2.0 * max((radius for i, matrix, radius in colliding), default=0.0)
+    if len(colliding) < 2 or spacing <= 0.0:
+        return {}
+    positions = np.concatenate([i.solver.verts @ m[:3, :3].T + m[:3, 3] for i, m, radius in colliding])
+    owners = np.repeat(np.arange(len(colliding)), [i.vertCount for i, m, radius in colliding])
+    grid = SpatialHash(spacing, positions, owners)
+    return {i: (grid, n, m) for n, (i, m, radius) in enumerate(colliding)}
+
+def wake_touching_bodies(colliding):
+    # A sleeping body with body collisions wakes when an awake one comes near
+    if not any(i.solver.sleeping for i, matrix, radius in colliding):
+        return
+    bounds = {}
+    for i, matrix, radius in colliding:
+        lo, hi = i.get_bounds(matrix)
+        bounds[i] = (lo - 2.0 * radius, hi + 2.0 * radius)
+    for i, matrix, radius in colliding:
+        if i.solver.sleeping:
+            for j, matrix, radius in colliding:
+                if not j.solver.sleeping and (bounds[i][0] <= bounds[j][1]).all() and (bounds[i][1] >= bounds[j][0]).all():
+                    i.solver.wake()
+                    break
+
+def simulate_bodies(scene, bodies, dt, gravity):
+    # Advance bodies by one frame. The bodies are independent, so with
+    # parallel stepping their solvers run at the same time on worker threads,
+    # NumPy releases the GIL inside its kernels. Reading from and writing to
+    # Blender stays on the main thread, before and after.
+    props = scene.tet_scene_properties
+    gravity = np.array(gravity, dtype=np.float64)
+    settings = [i.prepare_frame() for i in bodies]
+    colliding = get_colliding_bodies(bodies)
+    wake_touching_bodies(colliding)
+    obstacles = get_body_obstacles(colliding)
+    if props.parallel and len(bodies) > 1:
+        pool = get_step_pool(props.workers)
+        futures = [pool.submit(i.step_frame, dt, gravity, j, obstacles.get(i)) for i, j in zip(bodies, settings)]
+        for i in futures:
+            i.result()
+    else:
+        for i, j in zip(bodies, settings):
+            i.step_frame(dt, gravity, j, obstacles.get(i))
+    for i in bodies:
+        i.finish_frame()
+
+class SimulateAhead:
+    # Simulates the frames after the playhead on a worker thread while
+    # playback runs, so the frame handler only copies a finished frame into
+    # the meshes. Only bodies without deforming pins among static colliders
+    # qualify, their next frames do not depend on anything evaluated later.
+    # Frames go into a ring of slots per body, frame f in slot f % capacity.
+    # The slot of the frame on screen stays reserved, so the solvers can be
+    # put back to it whenever the buffer is dropped.
+    def __init__(self):
+        #-------------------------------------------------------------------
+        # Initialize condition, guards the frame counters between the threads
+        self.condition = threading.Condition()
+        # Initialize worker thread, None while nothing is simulated ahead
+        self.thread = None
+        # Initialize running flag, cleared to stop the worker
+        self.running = False
+        # Initialize bodies and what they are stepped with
+        self.bodies = []
+        self.settings = []
+        self.colliding = []
+        self.dt = 0.0
+        self.gravity = None
+        # Initialize key, everything the buffered frames depend on, see get_key
+        self.key = None
+        # Initialize ring, per body (capacity, N, 3) positions and previous positions and (capacity, StepStateSize) step states
+        self.capacity = 0
+        self.verts = []
+        self.previousPos = []
+        self.stepStates = []
+        # Initialize frame, the frame on screen, and the next frame the worker computes
+        self.frame = None
+        self.nextFrame = None
+        # Initialize frame end, the worker stops after it
+        self.frameEnd = None
+        #-------------------------------------------------------------------
+    
+    def get_key(self, scene, bodies, dt, gravity):
+        # None when the frames after this one cannot be known in advance
+        colliders = Colliders.get_static_key(scene, bpy.context.evaluated_depsgraph_get())
+        if colliders is None or not all(i.can_simulate_ahead() for i in bodies):
+            return None
+        transforms = tuple(tuple(tuple(row) for row in i.obj.matrix_world) for i in bodies)
+        return (tuple(i.get_settings_key() for i in bodies), colliders, transforms, dt, tuple(gravity))
+    
+    def start(self, scene, bodies, key, dt, gravity):
+        # The bodies have just finished scene.frame_current
+        self.bodies = list(bodies)
+        self.settings = [i.get_settings() for i in bodies]
+        self.colliding = get_colliding_bodies(bodies)
+        self.dt = dt
+        self.gravity = np.array(gravity, dtype=np.float64)
+        self.key = key
+        self.capacity = scene.tet_scene_properties.aheadFrames
+        self.verts = [np.empty((self.capacity, i.solver.vertCount, 3), dtype=np.float64) for i in bodies]
+        self.previousPos = [np.empty((self.capacity, i.solver.vertCount, 3), dtype=np.float64) for i in bodies]
+        self.stepStates = [np.empty((self.capacity, StepStateSize), dtype=np.float64) for i in bodies]
+        self.frame = scene.frame_current
+        self.nextFrame = self.frame + 1
+        self.frameEnd = scene.frame_end
+        self.store(self.frame)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="tetrahedralworkshop ahead", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        # Drop the buffered frames and put the solvers back to the frame on screen
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+        self.thread = None
+        slot = self.frame % self.capacity
+        for i, verts, previousPos, stepStates in zip(self.bodies, self.verts, self.previousPos, self.stepStates):
+            i.solver.verts[:] = verts[slot]
+            i.solver.previousPos[:] = previousPos[slot]
+            i.solver.currentPos[:] = previousPos[slot]
+            i.solver.set_step_state(stepStates[slot])
+        self.bodies = []
+        self.colliding = []
+        self.verts = []
+        self.previousPos = []
+        self.stepStates = []
+        self.key = None
+    
+    def store(self, frame):
+        slot = frame % self.capacity
+        for i, verts, previousPos, stepStates in zip(self.bodies, self.verts, self.previousPos, self.stepStates):
+            verts[slot] = i.solver.verts
+            previousPos[slot] = i.solver.previousPos
+            stepStates[slot] = i.solver.get_step_state()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.nextFrame - self.frame >= self.capacity:
+                    self.condition.wait()
+                if not self.running or self.nextFrame > self.frameEnd:
+                    return
+                frame = self.nextFrame
+            try:
+                wake_touching_bodies(self.colliding)
+                obstacles = get_body_obstacles(self.colliding)
+                for i, settings in zip(self.bodies, self.settings):
+                    i.solver.step(self.dt, self.gravity, settings, Colliders, obstacles=obstacles.get(i), matrix=i.matrix)
+            except Exception:
+                # The frame is simulated again on the main thread, where the error shows
+                with self.condition:
+                    self.running = False
+                    self.condition.notify_all()
+                raise
+            self.store(frame)
+            with self.condition:
+                self.nextFrame = frame + 1
+                self.condition.notify_all()
+    
+    def take(self, frame):
+        # Wait for frame when it is the one after the frame on screen and
+        # make it the frame on screen. Returns its slot, None on a miss.
+        with self.condition:
+            if frame != self.frame + 1:
+                return None
+            while self.running and self.nextFrame <= frame and frame <= self.frameEnd:
+                self.condition.wait()
+            if self.nextFrame <= frame:
+                return None
+            self.frame = frame
+            self.condition.notify_all()
+        return frame % self.capacity
+    
+    def play(self, scene, bodies, dt, gravity):
+        # Show scene.frame_current from the buffer, or simulate it now and
+        # start buffering from it when the buffer missed or is out of date
+        key = self.get_key(scene, bodies, dt, gravity) if bodies else None
+        if self.thread is not None and (key is None or key != self.key or bodies != self.bodies):
+            self.stop()
+        slot = self.take(scene.frame_current) if self.thread is not None else None
+        if slot is None:
+            self.stop()
+            simulate_bodies(scene, bodies, dt, gravity)
+            # Simulating may have updated the colliders and pins the key reads
+            key = self.get_key(scene, bodies, dt, gravity) if bodies else None
+            if key is not None:
+                self.start(scene, bodies, key, dt, gravity)
+            return
+        for i, verts, previousPos, stepStates in zip(bodies, self.verts, self.previousPos, self.stepStates):
+            i.finish_ahead_frame(scene.frame_current, verts[slot], previousPos[slot], stepStates[slot])
+
+Ahead = SimulateAhead()
+
+def simulate(scene):
+    if Seeking:
+        return
+    HandlerProfile.enabled = any(i != None and i.obj.tet_properties.profiling for i in SoftBodyList)
+    HandlerProfile.begin(bpy.context.scene.frame_current)
+    dt = bpy.context.scene.render.fps_base / bpy.context.scene.render.fps
+    gravity = bpy.context.scene.gravity.copy()
+    with HandlerProfile.phase("cacheLookup"):
+        bodies = [i for i in SoftBodyList if i != None and not i.is_baked(bpy.context.scene.frame_current)]
+    with HandlerProfile.phase("bodies"):
+        if bpy.context.scene.tet_scene_properties.simulateAhead:
+            Ahead.play(bpy.context.scene, bodies, dt, gravity)
+        else:
+            Ahead.stop()
+            simulate_bodies(bpy.context.scene, bodies, dt, gravity)
+    HandlerProfile.end()
+
+def load_bakes(scene):
+    if Seeking:
+        return
+    for i in SoftBodyList:
+        if i != None and i.is_baked(bpy.context.scene.frame_current):
+            i.load_baked_frame(bpy.context.scene.frame_current)
+
+def seek(scene, frame, bodies):
+    # Bring every body to its state after frame: restore the nearest earlier
+    # checkpoint and simulate forward only the frames after it.
+    global Seeking
+    dt = scene.render.fps_base / scene.render.fps
+    gravity = scene.gravity.copy()
+    Seeking = True
+    try:
+        starts = {i: i.restore_checkpoint(frame) for i in bodies}
+        for f in range(min(starts.values(), default=frame) + 1, frame + 1):
+            scene.frame_set(f)
+            simulate_bodies(scene, [i for i in bodies if starts[i] < f], dt, gravity)
+        for i in bodies:
+            if starts[i] == frame:
+                i.write_positions()
+    finally:
+        Seeking = False
+
+def seek_pending():
+    # Timer callback, frame_set cannot run inside the frame change handler
+    scene = bpy.context.scene
+    frame = scene.frame_current
+    bodies = [i for i in SoftBodyList if i != None and i.lastFrame != frame and i.obj.tet_properties.checkpointInterval > 0 and not i.is_baked(frame)]
+    if bodies and not Playing:
+        seek(scene, frame, bodies)
+    return None
+
+def seek_positions(scene):
+    if Seeking or Playing:
+        return
+    for i in SoftBodyList:
+        if i != None and i.lastFrame != scene.frame_current and i.obj.tet_properties.checkpointInterval > 0:
+            if not bpy.app.timers.is_registered(seek_pending):
+                bpy.app.timers.register(seek_pending)
+            return
+
+def bake(scene, frameStart, frameEnd):
+    # Simulate the range once and write every frame to the bodies' caches.
+    # Baking from a later frame keeps the frames before it.
+    Ahead.stop()
+    frameCurrent = scene.frame_current
+    dt = scene.render.fps_base / scene.render.fps
+    gravity = scene.gravity.copy()
+    bodies = [i for i in SoftBodyList if i != None]
+    for i in bodies:
+        i.obj.tet_properties.cache = 'None'
+        cache = i.get_point_cache()
+        if not cache.is_open() or cache.frameStart != scene.frame_start or cache.frameEnd != scene.frame_end:
+            cache.create(i.vertCount, scene.frame_start, scene.frame_end)
+        # Full states at the checkpoint interval, for renders that resume from them
+        interval = i.obj.tet_properties.checkpointInterval
+        states = i.get_state_cache()
+        if interval <= 0:
+            states.delete()
+        elif not states.is_open() or states.frameStart != scene.frame_start or states.frameEnd != scene.frame_end or states.frameStep != interval:
+            states.create(i.get_state_rows(), scene.frame_start, scene.frame_end, interval)
+        # The rest shape, a render node rebuilding the body needs it
+        save_rest(i.get_rest_path(), i.restCoords)
+    if frameStart > scene.frame_start:
+        seek(scene, frameStart - 1, bodies)
+    # What the states are simulated with, a later restore skips them when it changed
+    stateKeys = {i: i.get_state_key() for i in bodies}
+    wm = bpy.context.window_manager
+    wm.progress_begin(frameStart, frameEnd)
+    for frame in range(frameStart, frameEnd + 1):
+        scene.frame_set(frame)
+        simulate_bodies(scene, bodies, dt, gravity)
+        for i in bodies:
+            i.pointCache.write_frame(frame, i.solver.get_positions())
+            if i.stateCache.is_stored(frame):
+                i.write_state(frame, stateKeys[i])
+        wm.progress_update(frame)
+    wm.progress_end()
+    for i in bodies:
+        i.pointCache.flush()
+        i.stateCache.flush()
+        i.obj.tet_properties.cache = 'BAKED'
+    scene.frame_set(frameCurrent)
+
+def on_playback_start(scene):
+    global Playing
+    Playing = True
+    bpy.app.handlers.frame_change_pre.append(simulate)
+    return
+
+def on_playback_stop(scene):
+    global Playing
+    Playing = False
+    bpy.app.handlers.frame_change_pre.remove(simulate)
+    Ahead.stop()
+    return
+
+def on_depsgraph_update(scene, depsgraph):
+    Colliders.tag_updates(depsgraph)
+    tag_action_updates(depsgraph)
+
+def on_data_replaced(*args):
+    # Undo and loading a file can put other keyframes at the same pointers
+    ActionKeys.clear()
+
+def get_render_bodies(scene):
+    # A render node starts without the soft bodies of the session that saved
+    # the file, they are made again from the objects flagged as soft bodies
+    known = {i.obj.as_pointer() for i in SoftBodyList if i != None}
+    for obj in scene.objects:
+        if obj.type == 'MESH' and obj.tet_properties.isSoftBody and obj.as_pointer() not in known:
+            SoftBodyList.append(SoftBody(obj))
+    return [i for i in SoftBodyList if i != None and i.obj.name in scene.objects]
+
+def render_from_cache(scene, resume):
+    # Every rendered frame is loaded from the bake on its own, so frames can
+    # be rendered in any order and on different machines. Only the mapped
+    # pages of the rendered frame are read. Frames that are not baked fail,
+    # or with resume are simulated from the nearest state the bake stored.
+    frame = scene.frame_current
+    bodies = get_render_bodies(scene)
+    missing = [i for i in bodies if not i.get_point_cache().has_frame(frame)]
+    if missing and not resume:
+        fail_render("Tetrahedral Workshop: frame %d is not baked for %s. Bake it or render with Resume From States" % (frame, ", ".join(i.obj.name for i in missing)))
+    if missing:
+        seek(scene, frame, missing)
+    for i in bodies:
+        if i not in missing:
+            i.load_baked_frame(frame)
+
+def fail_render(message):
+    # A render handler cannot stop the render, an exception is printed and
+    # the frame rendered anyway. In the background, as on a render farm,
+    # the process exits with an error instead, so the frame is not written.
+    # In the interface the error is shown once the render lets go of it.
+    print(message, file=sys.stderr)
+    if bpy.app.background:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)
+    def show_error():
+        def draw(menu, context):
+            menu.layout.label(text=message)
+        try:
+            bpy.context.window_manager.popup_menu(draw, title="Render Failed", icon='ERROR')
+        except (RuntimeError, AttributeError):
+            return 1.0
+        return None
+    bpy.app.timers.register(show_error, first_interval=0.5)
+    raise RuntimeError(message)
+
+def on_render_pre(scene):
+    bpy.context.scene.render.use_lock_interface = True
+    if bpy.context.scene.tet_scene_properties.renderMode != 'SIMULATE':
+        render_from_cache(bpy.context.scene, bpy.context.scene.tet_scene_properties.renderMode == 'RESUME')
+        return
+    dt = bpy.context.scene.render.fps_base / bpy.context.scene.render.fps
+    gravity = bpy.context.scene.gravity.copy()
+    bodies = []
+    for i in SoftBodyList:
+        if i != None:
+            if i.is_baked(bpy.context.scene.frame_current):
+                i.load_baked_frame(bpy.context.scene.frame_current)
+            else:
+                bodies.append(i)
+    simulate_bodies(bpy.context.scene, bodies, dt, gravity)
+
+def reset_positions(scene):
+    if Seeking:
+        return
+    if bpy.context.scene.frame_current == bpy.context.scene.frame_start:
+        Ahead.stop()
+    for i in range (len(SoftBodyList)):
+        if SoftBodyList[i] != None:
+            if bpy.context.scene.frame_current == bpy.context.scene.frame_start:
+                SoftBodyList[i].reset_position()
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class TetProperties(bpy.types.PropertyGroup):
+        substeps: bpy.props.IntProperty(
+            name="",
+            description="",
+            default=3,
+            min=0,
+            max=1000,
+            step=1
+        )
+        adaptiveSubsteps: bpy.props.BoolProperty(
+            name="",
+            description="Pick the substeps of every frame from how fast the vertices move and how far the constraints are from rest",
+            default=False
+        )
+        minSubsteps: bpy.props.IntProperty(
+            name="",
+            description="Fewest substeps an adaptive frame takes",
+            default=1,
+            min=1,
+            max=1000,
+            step=1
+        )
+        maxSubsteps: bpy.props.IntProperty(
+            name="",
+            description="Most substeps an adaptive frame takes",
+            default=20,
+            min=1,
+            max=1000,
+            step=1
+        )
+        targetStrain: bpy.props.FloatProperty(
+            name="",
+            description="Largest relative edge length or volume error left after a frame, above which the substep count is held instead of dropping. 0 only uses the velocity bound",
+            default=0.05,
+            min=0.0,
+            max=1.0,
+            step=0.1,
+            precision=3
+        )
+        tolerance: bpy.props.FloatProperty(
+            name="",
+            description="Stop the distance and volume passes of a substep once their largest relative error is below this, the iteration counts are upper limits. 0 always runs every pass",
+            default=0.0,
+            min=0.0,
+            max=1.0,
+            step=0.01,
+            precision=5
+        )
+        relaxation: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('NONE', "None", "Every pass applies its corrections as they are"),
+                ('SOR', "Over-relaxation", "Scale every correction by omega"),
+                ('CHEBYSHEV', "Chebyshev", "Extrapolate each pass from the two before it"),
+            ],
+            default='NONE'
+        )
+        omega: bpy.props.FloatProperty(
+            name="",
+            description="Correction scale of over-relaxation, above 1 converges in fewer passes, close to 2 can oscillate",
+            default=1.5,
+            min=0.1,
+            max=1.99,
+            step=10,
+            precision=2
+        )
+        spectralRadius: bpy.props.FloatProperty(
+            name="",
+            description="Estimated convergence rate of a pass for Chebyshev acceleration, closer to 1 extrapolates further",
+            default=0.9,
+            min=0.0,
+            max=0.999,
+            step=1,
+            precision=3
+        )
+        multigridLevels: bpy.props.IntProperty(
+            name="",
+            description="Coarser meshes solved before the simulation mesh in every substep, so large stiff bodies need fewer iterations. 0 solves only the simulation mesh",
+            default=0,
+            min=0,
+            max=4,
+            step=1
+        )
+        coarsening: bpy.props.FloatProperty(
+            name="",
+            description="Cell size of each coarser level in median edge lengths of the level above it",
+            default=1.5,
+            min=1.1,
+            max=4.0,
+            step=10,
+            precision=2
+        )
+        distanceIterations: bpy.props.IntProperty(
+            name="",
+            description="",
+            default=1,
+            min=0,
+            max=1000,
+            step=1
+        )
+        volumeIterations: bpy.props.IntProperty(
+            name="",
+            description="",
+            default=1,
+            min=0,
+            max=1000,
+            step=1
+        )
+        collisionIterations: bpy.props.IntProperty(
+            name="",
+            description="",
+            default=3,
+            min=0,
+            max=1000,
+            step=1
+        )
+        pinIterations: bpy.props.IntProperty(
+            name="",
+            description="",
+            default=1,
+            min=0,
+            max=1000,
+            step=1
+        )
+        
+        distanceMass: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        distanceMassE: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('10000000000', "1e+10", ""),
+                ('1000000000', "1e+9", ""),
+                ('100000000', "1e+8", ""),
+                ('10000000', "1e+7", ""),
+                ('1000000', "1e+6", ""),
+                ('100000', "1e+5", ""),
+                ('10000', "1e+4", ""),
+                ('1000', "1000", ""),
+                ('100', "100", ""),
+                ('10', "10", ""),
+                ('1', "1", ""),
+                ('0.1', "0.1", ""),
+                ('0.01', "0.01", ""),
+                ('0.001', "0.001", ""),
+                ('0.0001', "1e-4", ""),
+                ('0.00001', "1e-5", ""),
+                ('0.000001', "1e-6", ""),
+                ('0.0000001', "1e-7", ""),
+                ('0.00000001', "1e-8", ""),
+                ('0.000000001', "1e-9", ""),
+                ('0.0000000001', "1e-10", "")
+            ],
+            default='1'
+        )
+        distanceStiffness: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        distanceStiffnessE: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('10000000000', "1e+10", ""),
+                ('1000000000', "1e+9", ""),
+                ('100000000', "1e+8", ""),
+                ('10000000', "1e+7", ""),
+                ('1000000', "1e+6", ""),
+                ('100000', "1e+5", ""),
+                ('10000', "1e+4", ""),
+                ('1000', "1000", ""),
+                ('100', "100", ""),
+                ('10', "10", ""),
+                ('1', "1", ""),
+                ('0.1', "0.1", ""),
+                ('0.01', "0.01", ""),
+                ('0.001', "0.001", ""),
+                ('0.0001', "1e-4", ""),
+                ('0.00001', "1e-5", ""),
+                ('0.000001', "1e-6", ""),
+                ('0.0000001', "1e-7", ""),
+                ('0.00000001', "1e-8", ""),
+                ('0.000000001', "1e-9", ""),
+                ('0.0000000001', "1e-10", "")
+            ],
+            default='1000'
+        )
+        distanceDamping: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        distanceDampingE: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('10000000000', "1e+10", ""),
+                ('1000000000', "1e+9", ""),
+                ('100000000', "1e+8", ""),
+                ('10000000', "1e+7", ""),
+                ('1000000', "1e+6", ""),
+                ('100000', "1e+5", ""),
+                ('10000', "1e+4", ""),
+                ('1000', "1000", ""),
+                ('100', "100", ""),
+                ('10', "10", ""),
+                ('1', "1", ""),
+                ('0.1', "0.1", ""),
+                ('0.01', "0.01", ""),
+                ('0.001', "0.001", ""),
+                ('0.0001', "1e-4", ""),
+                ('0.00001', "1e-5", ""),
+                ('0.000001', "1e-6", ""),
+                ('0.0000001', "1e-7", ""),
+                ('0.00000001', "1e-8", ""),
+                ('0.000000001', "1e-9", ""),
+                ('0.0000000001', "1e-10", "")
+            ],
+            default='1'
+        )
+        
+        volumeStiffness: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        volumeStiffnessE: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('10000000000', "1e+10", ""),
+                ('1000000000', "1e+9", ""),
+                ('100000000', "1e+8", ""),
+                ('10000000', "1e+7", ""),
+                ('1000000', "1e+6", ""),
+                ('100000', "1e+5", ""),
+                ('10000', "1e+4", ""),
+                ('1000', "1000", ""),
+                ('100', "100", ""),
+                ('10', "10", ""),
+                ('1', "1", ""),
+                ('0.1', "0.1", ""),
+                ('0.01', "0.01", ""),
+                ('0.001', "0.001", ""),
+                ('0.0001', "1e-4", ""),
+                ('0.00001', "1e-5", ""),
+                ('0.000001', "1e-6", ""),
+                ('0.0000001', "1e-7", ""),
+                ('0.00000001', "1e-8", ""),
+                ('0.000000001', "1e-9", ""),
+                ('0.0000000001', "1e-10", "")
+            ],
+            default='100000'
+        )
+        volumeDamping: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        volumeDampingE: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('10000000000', "1e+10", ""),
+                ('1000000000', "1e+9", ""),
+                ('100000000', "1e+8", ""),
+                ('10000000', "1e+7", ""),
+                ('1000000', "1e+6", ""),
+                ('100000', "1e+5", ""),
+                ('10000', "1e+4", ""),
+                ('1000', "1000", ""),
+                ('100', "100", ""),
+                ('10', "10", ""),
+                ('1', "1", ""),
+                ('0.1', "0.1", ""),
+                ('0.01', "0.01", ""),
+                ('0.001', "0.001", ""),
+                ('0.0001', "1e-4", ""),
+                ('0.00001', "1e-5", ""),
+                ('0.000001', "1e-6", ""),
+                ('0.0000001', "1e-7", ""),
+                ('0.00000001', "1e-8", ""),
+                ('0.000000001', "1e-9", ""),
+                ('0.0000000001', "1e-10", "")
+            ],
+            default='1'
+        )
+        
+        collisionRadius: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=0.1,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        friction: bpy.props.FloatProperty(
+            name="",
+            description="",
+            default=1.0,
+            min=0.0,
+            max=100.0,
+            step=10,
+            precision=2
+        )
+        selfCollision: bpy.props.BoolProperty(
+            name="",
+            description="Keep vertices of this body at least two collision radii apart, except where they are that close at rest",
+            default=False
+        )
+        bodyCollision: bpy.props.BoolProperty(
+            name="",
+            description="Collide with the other soft bodies that have body collision enabled",
+            default=False
+        )
+        
+        sleep: bpy.props.BoolProperty(
+            name="",
+            description="Stop simulating the body once it has come to rest, until something near it moves",
+            default=False
+        )
+        sleepThreshold: bpy.props.FloatProperty(
+            name="",
+            description="Largest distance a vertex may move in a frame for the body to count as resting",
+            default=0.001,
+            min=0.0,
+            max=100.0,
+            step=0.01,
+            precision=4
+        )
+        sleepFrames: bpy.props.IntProperty(
+            name="",
+            description="Frames in a row the body has to rest before it sleeps",
+            default=10,
+            min=1,
+            max=1000,
+            step=1
+        )
+        
+        isSoftBody: bpy.props.BoolProperty(
+            name="",
+            description="Set while the object is a soft body, so renders of the saved file find it",
+            default=False
+        )
+        outputTarget: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('BASE', "Base Mesh", "Overwrite the vertex coordinates of the mesh"),
+                ('SHAPE_KEY', "Shape Key", "Write into a shape key, the base mesh keeps its rest shape"),
+                ('ATTRIBUTE', "Attribute", "Write into a point attribute for geometry nodes, the base mesh keeps its rest shape"),
+            ],
+            default='BASE'
+        )
+        outputName: bpy.props.StringProperty(
+            name="",
+            description="Name of the shape key or attribute the positions are written to",
+            default="Tetrahedral Workshop"
+        )
+        embedTarget: bpy.props.PointerProperty(
+            name="",
+            description="High resolution mesh deformed by this body, bound to the tets it lies in when it is set",
+            type=bpy.types.Object,
+            poll=lambda self, obj: obj.type == 'MESH'
+        )
+        
+        pinGroup: bpy.props.StringProperty(
+            name="",
+            description="",
+            default=""
+        )
+        
+        cache: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('None', "Simulate", "Simulate every frame"),
+                ('BAKED', "Baked", "Play back the baked point cache"),
+            ],
+            default='None'
+        )
+        cacheDirectory: bpy.props.StringProperty(
+            name="",
+            description="Directory the point caches are written to",
+            default="//tetcache",
+            subtype='DIR_PATH'
+        )
+        checkpointInterval: bpy.props.IntProperty(
+            name="",
+            description="Store the full state every this many frames so seeking only simulates from the nearest one, 0 disables seeking",
+            default=10,
+            min=0,
+            max=1000,
+            step=1
+        )
+        
+        profiling: bpy.props.BoolProperty(
+            name="",
+            description="Record how long each phase of a simulated frame takes",
+            default=False
+        )
+        
+class TetSceneProperties(bpy.types.PropertyGroup):
+        parallel: bpy.props.BoolProperty(
+            name="",
+            description="Step independent soft bodies at the same time on worker threads",
+            default=False
+        )
+        workers: bpy.props.IntProperty(
+            name="",
+            description="Worker threads for parallel stepping, 0 uses one per CPU core",
+            default=0,
+            min=0,
+            max=256,
+            step=1
+        )
+        renderMode: bpy.props.EnumProperty(
+            name="",
+            items=[
+                ('SIMULATE', "Simulate", "Simulate a step for every rendered frame, frames have to be rendered in order on one machine"),
+                ('CACHE', "Baked Only", "Load every rendered frame from the bake, rendering a frame that is not baked fails"),
+                ('RESUME', "Resume From States", "Load baked frames, simulate the others from the nearest full state the bake stored"),
+            ],
+            default='SIMULATE'
+        )
+        simulateAhead: bpy.props.BoolProperty(
+            name="",
+            description="During playback, simulate the next frames on a worker thread while the current one is shown. Only used while no pin group follows a deforming mesh and no collider moves or deforms",
+            default=False
+        )
+        aheadFrames: bpy.props.IntProperty(
+            name="",
+            description="Frames buffered ahead of the playhead, including the one on screen",
+            default=8,
+            min=2,
+            max=250,
+            step=1
+        )
+        
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Main class
+class TetrahedralWorkshop(bpy.types.Panel):
+    bl_label = "TetrahedralWorkshop"
+    bl_idname = "OBJECT_PT_TETRAHEDRALWORKSHOP"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = "physics"
+    bl_options = {'HIDE_HEADER'}
+    
+    @classmethod
+    def poll(cls, context):
+        for i in SoftBodyList:
+            if i.obj not in bpy.data.objects.values():
+                SoftBodyList.remove(i)
+        return context.active_object.type == 'MESH'
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row()
+        row.operator("object.tetrahedral_workshop_button", icon="MESH_DATA")
+    
+    # Main button
+    class TetrahedralWorkshopButton(bpy.types.Operator):
+        bl_idname = "object.tetrahedral_workshop_button"
+        bl_label = "Tetrahedral Workshop"
+
+        def execute(self, context):
+            Ahead.stop()
+            for i in range(len(SoftBodyList)):
+                if SoftBodyList[i].obj == bpy.context.object:
+                    SoftBodyList[i].reset_position()
+                    for propName, prop in SoftBodyList[i].obj.tet_properties.bl_rna.properties.items():
+                            SoftBodyList[i].obj.tet_properties.property_unset(propName)
+                    SoftBodyList.remove(SoftBodyList[i])
+                    return {'FINISHED'}
+            if len(SoftBodyList) == 0:
+                SoftBodyList.append(SoftBody(bpy.context.object))
+                bpy.context.object.tet_properties.isSoftBody = True
+                return {'FINISHED'}
+            for i in SoftBodyList:
+                if i.obj != bpy.context.object:
+                    SoftBodyList.append(SoftBody(bpy.context.object))
+                    bpy.context.object.tet_properties.isSoftBody = True
+                    return {'FINISHED'}
+            return {'FINISHED'}
+    
+    # Main panel
+    class TetrahedralWorkshopPanel(bpy.types.Panel):
+        bl_label = "Tetrahedral Workshop"
+        bl_idname = "OBJECT_PT_TETRAHEDRALWORKSHOPPANEL"
+        bl_space_type = 'PROPERTIES'
+        bl_region_type = 'WINDOW'
+        bl_context = "physics"
+        
+        # Only show panel if the selected object is in the SoftBodyArray.
+        @classmethod
+        def poll(cls, context):
+            for i in SoftBodyList:
+                if i != None:
+                    if bpy.context.object == i.obj:
+                        return True
+            return False
+                
+        def draw(self, context):
+            layout = self.layout
+            props = context.object.tet_properties
+            
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Adaptive Substeps")
+            col.prop(props, "adaptiveSubsteps")
+            if props.adaptiveSubsteps:
+                col.label(text="Min Substeps")
+                col.prop(props, "minSubsteps")
+                col.label(text="Max Substeps")
+                col.prop(props, "maxSubsteps")
+                col.label(text="Target Error")
+                col.prop(props, "targetStrain")
+                for i in SoftBodyList:
+                    if i != None and i.obj == context.object:
+                        col.label(text="Last Frame")
+                        col.label(text="%d substeps, error %.4f" % (i.solver.substeps, i.solver.residual))
+            else:
+                col.label(text="Substeps")
+                col.prop(props, "substeps")
+            
+            row = layout.row()
+            row.label(text="Constraint Iterations:", icon='LOOP_FORWARDS')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Distance")
+            col.prop(props, "distanceIterations")
+            col.label(text="Volume")
+            col.prop(props, "volumeIterations")
+            col.label(text="Collision")
+            col.prop(props, "collisionIterations")
+            col.label(text="Tolerance")
+            col.prop(props, "tolerance")
+            col.label(text="Acceleration")
+            col.prop(props, "relaxation")
+            if props.relaxation == 'SOR':
+                col.label(text="Omega")
+                col.prop(props, "omega")
+            elif props.relaxation == 'CHEBYSHEV':
+                col.label(text="Spectral Radius")
+                col.prop(props, "spectralRadius")
+            col.label(text="Multigrid Levels")
+            col.prop(props, "multigridLevels")
+            if props.multigridLevels > 0:
+                col.label(text="Coarsening")
+                col.prop(props, "coarsening")
+            for i in SoftBodyList:
+                if i != None and i.obj == context.object:
+                    # The error left is only measured when something uses it
+                    if props.tolerance > 0.0 or props.adaptiveSubsteps:
+                        col.label(text="Distance Passes")
+                        col.label(text="%d, error %.5f" % (i.solver.distancePasses, i.solver.distanceResidual))
+                        col.label(text="Volume Passes")
+                        col.label(text="%d, error %.5f" % (i.solver.volumePasses, i.solver.volumeResidual))
+                    else:
+                        col.label(text="Distance Passes")
+                        col.label(text="%d" % i.solver.distancePasses)
+                        col.label(text="Volume Passes")
+                        col.label(text="%d" % i.solver.volumePasses)
+                    if props.multigridLevels > 0:
+                        col.label(text="Levels Built")
+                        col.label(text="%d" % i.solver.get_level_count())
+            
+            row = layout.row()
+            row.label(text="Distance Constraints", icon='ARROW_LEFTRIGHT')
+            col = layout.grid_flow(row_major=True, columns=3, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Mass")
+            col.prop(props, "distanceMass")
+            col.prop(props, "distanceMassE")
+            col.label(text="Stiffness")
+            col.prop(props, "distanceStiffness")
+            col.prop(props, "distanceStiffnessE")
+            col.label(text="Damping")
+            col.prop(props, "distanceDamping")
+            col.prop(props, "distanceDampingE")
+            
+            row = layout.row()
+            row.label(text="Volume Constraints:", icon='CUBE')
+            col = layout.grid_flow(row_major=True, columns=3, even_columns=True, even_rows=False, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Preservation")
+            col.prop(props, "volumeStiffness")
+            col.prop(props, "volumeStiffnessE")
+            col.label(text="Damping")
+            col.prop(props, "volumeDamping")
+            col.prop(props, "volumeDampingE")
+            
+            row = layout.row()
+            row.label(text="Forces:", icon='FORCE_FORCE')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Collision Radius")
+            col.prop(props, "collisionRadius")
+            col.label(text="Friction")
+            col.prop(props, "friction")
+            col.label(text="Self Collision")
+            col.prop(props, "selfCollision")
+            col.label(text="Body Collision")
+            col.prop(props, "bodyCollision")
+            
+            row = layout.row()
+            row.label(text="Pin Points:", icon='SNAP_MIDPOINT')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Pin Group")
+            col.prop_search(props, "pinGroup", bpy.context.object, "vertex_groups")
+            
+            row = layout.row()
+            row.label(text="Sleeping:", icon='SORTTIME')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Sleep When Resting")
+            col.prop(props, "sleep")
+            if props.sleep:
+                col.label(text="Threshold")
+                col.prop(props, "sleepThreshold")
+                col.label(text="Frames")
+                col.prop(props, "sleepFrames")
+                for i in SoftBodyList:
+                    if i != None and i.obj == context.object:
+                        col.label(text="State")
+                        col.label(text="Sleeping" if i.solver.sleeping else "Awake")
+            
+            row = layout.row()
+            row.label(text="Output:", icon='EXPORT')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Target")
+            col.prop(props, "outputTarget")
+            if props.outputTarget != 'BASE':
+                col.label(text="Name")
+                col.prop(props, "outputName")
+            
+            row = layout.row()
+            row.label(text="Embedded Mesh:", icon='MOD_MESHDEFORM')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Target")
+            col.prop(props, "embedTarget")
+            
+            row = layout.row()
+            row.label(text="Cache:", icon='DISK_DRIVE') 
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Playback")
+            col.prop(props, "cache")
+            col.label(text="Directory")
+            col.prop(props, "cacheDirectory")
+            col.label(text="Checkpoint Interval")
+            col.prop(props, "checkpointInterval")
+            col = layout.grid_flow(row_major=True, columns=1, even_columns=True, even_rows=True, align=False)
+            col.operator("object.bake_button")
+            col.operator("object.bake_from_current_frame_button")
+            col.operator("object.delete_all_bakes_button")
+            
+            row = layout.row()
+            row.label(text="Scene:", icon='SCENE_DATA')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Parallel Stepping")
+            col.prop(context.scene.tet_scene_properties, "parallel")
+            if context.scene.tet_scene_properties.parallel:
+                col.label(text="Workers")
+                col.prop(context.scene.tet_scene_properties, "workers")
+            col.label(text="Render")
+            col.prop(context.scene.tet_scene_properties, "renderMode")
+            col.label(text="Simulate Ahead")
+            col.prop(context.scene.tet_scene_properties, "simulateAhead")
+            if context.scene.tet_scene_properties.simulateAhead:
+                col.label(text="Buffered Frames")
+                col.prop(context.scene.tet_scene_properties, "aheadFrames")
+            
+            row = layout.row()
+            row.label(text="Profiling:", icon='TIME')
+            col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+            col.alignment = 'CENTER'
+            col.label(text="Record Timings")
+            col.prop(props, "profiling")
+            if props.profiling:
+                for i in SoftBodyList:
+                    if i != None and i.obj == context.object:
+                        averages = i.profile.get_averages()
+                        last = i.profile.get_last()
+                        col = layout.grid_flow(row_major=True, columns=3, even_columns=True, even_rows=True, align=True)
+                        col.alignment = 'CENTER'
+                        col.label(text="Phase")
+                        col.label(text="Average ms")
+                        col.label(text="Last ms")
+                        for phase, seconds in averages.items():
+                            col.label(text=phase)
+                            col.label(text="%.2f" % (seconds * 1000.0))
+                            col.label(text="%.2f" % (last.get(phase, 0.0) * 1000.0))
+                        col.label(text="Total")
+                        col.label(text="%.2f" % (sum(averages.values()) * 1000.0))
+                        col.label(text="%.2f" % (sum(last.values()) * 1000.0))
+                col = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=True, align=False)
+                col.operator("object.export_profile_button")
+                col.operator("object.clear_profile_button")
+            
+    class BakeButton(bpy.types.Operator):
+        bl_idname = "object.bake_button"
+        bl_label = "Bake"
+
+        def execute(self, context):
+            bake(context.scene, context.scene.frame_start, context.scene.frame_end)
+            return {'FINISHED'}
+        
+    class BakeFromCurrentFrameButton(bpy.types.Operator):
+        bl_idname = "object.bake_from_current_frame_button"
+        bl_label = "Bake from current frame"
+
+        def execute(self, context):
+            bake(context.scene, max(context.scene.frame_current, context.scene.frame_start), context.scene.frame_end)
+            return {'FINISHED'}
+        
+    class DeleteAllBakesButton(bpy.types.Operator):
+        bl_idname = "object.delete_all_bakes_button"
+        bl_label = "Delete all bakes"
+
+        def execute(self, context):
+            for i in SoftBodyList:
+                if i != None:
+                    i.delete_bake()
+            return {'FINISHED'}
+        
+    class ExportProfileButton(bpy.types.Operator):
+        bl_idname = "object.export_profile_button"
+        bl_label = "Export timings"
+        bl_description = "Write the recorded timings of every soft body to a .csv or .json file"
+        
+        filepath: bpy.props.StringProperty(subtype='FILE_PATH', default="tetprofile.csv")
+        
+        def invoke(self, context, event):
+            context.window_manager.fileselect_add(self)
+            return {'RUNNING_MODAL'}
+        
+        def execute(self, context):
+            profiles = [i.profile for i in SoftBodyList if i != None] + [HandlerProfile]
+            path = bpy.path.abspath(self.filepath)
+            if path.lower().endswith(".json"):
+                write_json(path, profiles)
+            else:
+                write_csv(path, profiles)
+            return {'FINISHED'}
+        
+    class ClearProfileButton(bpy.types.Operator):
+        bl_idname = "object.clear_profile_button"
+        bl_label = "Clear timings"
+        
+        def execute(self, context):
+            for i in SoftBodyList:
+                if i != None:
+                    i.profile.clear()
+            HandlerProfile.clear()
+            return {'FINISHED'}
+        
+    bpy.utils.register_class(TetrahedralWorkshopButton)
+    bpy.utils.register_class(TetrahedralWorkshopPanel)
+    bpy.utils.register_class(BakeButton)
+    bpy.utils.register_class(BakeFromCurrentFrameButton)
+    bpy.utils.register_class(DeleteAllBakesButton)
+    bpy.utils.register_class(ExportProfileButton)
+    bpy.utils.register_class(ClearProfileButton)
+    bpy.utils.register_class(TetProperties)
+    bpy.types.Object.tet_properties = bpy.props.PointerProperty(type=TetProperties)
+    bpy.utils.register_class(TetSceneProperties)
+    bpy.types.Scene.tet_scene_properties = bpy.props.PointerProperty(type=TetSceneProperties)
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def register():
+    # Clear handlers when reloading script...
+    bpy.app.handlers.frame_change_pre.clear()
+    bpy.app.handlers.animation_playback_pre.clear()
+    bpy.app.handlers.animation_playback_post.clear()
+    bpy.app.handlers.render_pre.clear()
+    
+    bpy.utils.register_class(TetrahedralWorkshop)
+    bpy.app.handlers.animation_playback_pre.append(on_playback_start)
+    bpy.app.handlers.animation_playback_post.append(on_playback_stop)
+    bpy.app.handlers.frame_change_pre.append(reset_positions)
+    bpy.app.handlers.frame_change_pre.append(load_bakes)
+    bpy.app.handlers.frame_change_pre.append(seek_positions)
+    bpy.app.handlers.render_pre.append(on_render_pre)
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        handlers.append(on_data_replaced)
+
+def unregister():
+    bpy.utils.unregister_class(TetrahedralWorkshop)
+    
+    # Should only remove the specific functions instead of clear...
+    bpy.app.handlers.frame_change_pre.clear()
+    bpy.app.handlers.animation_playback_pre.clear()
+    bpy.app.handlers.animation_playback_post.clear()
+    bpy.app.handlers.render_pre.clear()
+    if on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(on_depsgraph_update)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        if on_data_replaced in handlers:
+            handlers.remove(on_data_replaced)
+    ActionKeys.clear()
+    Ahead.stop()
+    shutdown_step_pool()
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import numpy as np
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# File layout:
+#   header    64 bytes, see HeaderDtype
+#   flags     one byte per frame, 1 when the frame has been written
+#   frames    one float32 (vertCount, 3) block per stored frame, 64 byte
+#             aligned. Every frameStep-th frame from frameStart is stored,
+#             so frame f starts at dataOffset + (f - frameStart) // frameStep * stride
+Magic = b"TETCACHE"
+Version = 1
+HeaderSize = 64
+HeaderDtype = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("vertCount", "<u4"),
+    ("frameStart", "<i4"),
+    ("frameEnd", "<i4"),
+    ("frameStep", "<i4"),
+])
+
+# Bumped whenever the contents of Solver.get_topology change
+TopologyVersion = 1
+
+def align(size, alignment=64):
+    return (size + alignment - 1) // alignment * alignment
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class PointCache:
+    def __init__(self, path):
+        #-------------------------------------------------------------------
+        # Initialize file path
+        self.path = path
+        # Initialize memory map of the whole file
+        self.mm = None
+        # Initialize frame flags view, (frameCount,) uint8
+        self.flags = None
+        # Initialize frames view, (frameCount, vertCount, 3) float32
+        self.frames = None
+        # Initialize cached frame range, step and vert count
+        self.vertCount = 0
+        self.frameStart = 0
+        self.frameEnd = -1
+        self.frameStep = 1
+        #-------------------------------------------------------------------
+
+    def create(self, vertCount, frameStart, frameEnd, frameStep=1):
+        self.close()
+        frameCount = (frameEnd - frameStart) // frameStep + 1
+        dataOffset = align(HeaderSize + frameCount)
+        size = dataOffset + frameCount * vertCount * 3 * 4
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.mm = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(size,))
+        header = np.zeros(1, dtype=HeaderDtype)
+        header["magic"] = Magic
+        header["version"] = Version
+        header["vertCount"] = vertCount
+        header["frameStart"] = frameStart
+        header["frameEnd"] = frameEnd
+        header["frameStep"] = frameStep
+        self.mm[:HeaderDtype.itemsize] = header.view(np.uint8)
+        self.map_views(vertCount, frameStart, frameEnd, frameStep)
+        return self
+
+    def open(self, vertCount=None, writable=True):
+        # Map an existing cache, False when it is missing or does not match.
+        # Only the header is read here, frames are paged in as they are used.
+        self.close()
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) < HeaderSize:
+            return False
+        mm = np.memmap(self.path, dtype=np.uint8, mode="r+" if writable else "r")
+        header = mm[:HeaderDtype.itemsize].view(HeaderDtype)[0]
+        if header["magic"] != Magic or header["version"] != Version:
+            return False
+        if vertCount is not None and header["vertCount"] != vertCount:
+            return False
+        frameStep = int(header["frameStep"])
+        if frameStep < 1:
+            return False
+        frameCount = (int(header["frameEnd"]) - int(header["frameStart"])) // frameStep + 1
+        if len(mm) < align(HeaderSize + frameCount) + frameCount * int(header["vertCount"]) * 3 * 4:
+            return False
+        self.mm = mm
+        self.map_views(int(header["vertCount"]), int(header["frameStart"]), int(header["frameEnd"]), frameStep)
+        return True
+
+    def map_views(self, vertCount, frameStart, frameEnd, frameStep=1):
+        frameCount = (frameEnd - frameStart) // frameStep + 1
+        dataOffset = align(HeaderSize + frameCount)
+        self.vertCount = vertCount
+        self.frameStart = frameStart
+        self.frameEnd = frameEnd
+        self.frameStep = frameStep
+        self.flags = self.mm[HeaderSize:HeaderSize + frameCount]
+        self.frames = self.mm[dataOffset:dataOffset + frameCount * vertCount * 3 * 4].view(np.float32).reshape(frameCount, vertCount, 3)
+
+    def is_open(self):
+        return self.mm is not None
+
+    def is_stored(self, frame):
+        # Whether frame has a place in the file, written or not
+        return self.mm is not None and self.frameStart <= frame <= self.frameEnd and (frame - self.frameStart) % self.frameStep == 0
+
+    def has_frame(self, frame):
+        if not self.is_stored(frame):
+            return False
+        return bool(self.flags[(frame - self.frameStart) // self.frameStep])
+
+    def get_latest_frame(self, frame):
+        # The last written frame at or before frame, None without one
+        if self.mm is None or frame < self.frameStart:
+            return None
+        written = np.flatnonzero(self.flags[:(min(frame, self.frameEnd) - self.frameStart) // self.frameStep + 1])
+        if not len(written):
+            return None
+        return self.frameStart + int(written[-1]) * self.frameStep
+
+    def read_frame(self, frame):
+        # A view into the mapped file, nothing is copied until it is used
+        return self.frames[(frame - self.frameStart) // self.frameStep]
+
+    def write_frame(self, frame, positions):
+        self.frames[(frame - self.frameStart) // self.frameStep] = positions
+        self.flags[(frame - self.frameStart) // self.frameStep] = 1
+
+    def flush(self):
+        if self.mm is not None and self.mm.mode != "r":
+            self.mm.flush()
+
+    def close(self):
+        self.flush()
+        self.mm = None
+        self.flags = None
+        self.frames = None
+
+    def delete(self):
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def get_topology_key(*arrays):
+    # Hash of the raw connectivity arrays the topology is derived from
+    digest = hashlib.blake2b(digest_size=16)
+    for i in arrays:
+        i = np.ascontiguousarray(i)
+        digest.update(str((i.dtype.str, i.shape)).encode())
+        digest.update(i.tobytes())
+    return digest.hexdigest()
+
+def save_topology(path, key, topology):
+    # Colors are ragged, each list is stored concatenated along with its sizes
+    arrays = {"version": np.array(TopologyVersion), "key": np.array(key)}
+    for name, value in topology.items():
+        if isinstance(value, list):
+            arrays[name] = np.concatenate(value) if value else np.zeros(0, dtype=np.int64)
+            arrays[name + "Sizes"] = np.array([len(i) for i in value], dtype=np.int64)
+        else:
+            arrays[name] = value
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written under another name first, a half written file is never loaded
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(path + ".tmp", path)
+
+def save_rest(path, coords):
+    # The (N * 3,) float32 rest coordinates a bake was simulated from, the
+    # base mesh of a saved file may hold a baked frame instead
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.asarray(coords, dtype=np.float32).ravel())
+    os.replace(path + ".tmp", path)
+
+def load_rest(path, vertCount):
+    # The saved rest coordinates, None when missing, unreadable or for another mesh
+    if not os.path.isfile(path):
+        return None
+    try:
+        coords = np.load(path, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if coords.dtype != np.float32 or coords.shape != (vertCount * 3,):
+        return None
+    return coords
+
+def load_topology(path, key):
+    # The saved topology, None when it is missing, stale or unreadable
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != TopologyVersion or str(data["key"]) != key:
+                return None
+            topology = {}
+            for name in data.files:
+                if name in ("version", "key") or name.endswith("Sizes"):
+                    continue
+                if name + "Sizes" in data.files:
+                    topology[name] = np.split(data[name], np.cumsum(data[name + "Sizes"])[:-1])
+                else:
+                    topology[name] = data[name]
+            return topology
+    except (OSError, ValueError, KeyError):
+        return None
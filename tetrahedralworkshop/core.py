@@ -0,0 +1,969 @@
+import numpy as np
+from .profiling import NullProfile
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Vertex order of the face opposite each tet vertex, used for the volume gradients
+VolIdOrder = ((1,3,2), (0,2,3), (0,3,1), (0,1,2))
+
+# Fraction of the collision radius or shortest edge a vertex may travel in
+# one adaptive substep
+CourantNumber = 0.5
+
+# Factor the constraint error has to fall below from one frame to the next
+# for adaptive substeps to keep their count
+ResidualFalling = 0.99
+
+# Values in Solver.get_step_state
+StepStateSize = 6
+
+# The 27 cells around and including a cell, for spatial hash queries
+NeighborOffsets = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+# Most point / candidate pairs a spatial hash search holds at once
+NearestPairLimit = 1 << 22
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def get_morton_order(positions):
+    # Permutation sorting (N, 3) points along a Z-order curve over their
+    # bounding box, so points close in space end up close in memory
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if not len(positions):
+        return np.zeros(0, dtype=np.int64)
+    lo = positions.min(axis=0)
+    size = max(float((positions.max(axis=0) - lo).max()), 0.000000000000001)
+    cells = np.minimum((positions - lo) * (2097151.0 / size), 2097151.0).astype(np.uint64)
+    # Spread the 21 bits of every axis three apart and interleave them
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        cells = (cells | (cells << np.uint64(shift))) & np.uint64(mask)
+    codes = cells[:, 0] | (cells[:, 1] << np.uint64(1)) | (cells[:, 2] << np.uint64(2))
+    return np.argsort(codes, kind="stable")
+
+def get_tet_volumes(positions, tetIds):
+    # Signed volumes of (K, 4) tets
+    p = positions[tetIds]
+    cross = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    return np.einsum("ij,ij->i", cross, p[:, 3] - p[:, 0]) / 6.0
+
+def get_tet_gradients(positions, tetIds):
+    # Batched volume constraint terms for (K, 4) tets: the (K, 4, 3) gradients
+    # of each tet vertex, the (K,) weights and the (K,) signed volumes.
+    p = positions[tetIds]
+    grads = np.zeros((len(tetIds), 4, 3), dtype=np.float64)
+    w = np.zeros(len(tetIds), dtype=np.float64)
+    for j in range(4):
+        id0, id1, id2 = VolIdOrder[j]
+        cross = np.cross(p[:, id1] - p[:, id0], p[:, id2] - p[:, id0])
+        crossLength = np.sqrt(np.einsum("ij,ij->i", cross, cross))
+        # Degenerate faces contribute neither gradient nor weight
+        valid = crossLength >= 0.000000000000001
+        grads[valid, j] = cross[valid] / 6
+        w[valid] -= crossLength[valid]
+    # The last face is (0, 1, 2), so its cross product also gives the volume
+    vol = np.einsum("ij,ij->i", cross, p[:, 3] - p[:, 0]) / 6.0
+    vol[~valid] = 0.0
+    return grads, w, vol
+
+def color_constraints(ids, vertCount):
+    # Split constraints (rows of vertex ids) into colors so that no two
+    # constraints of one color share a vertex. Every color can then be solved
+    # as one batch without scatter conflicts, one color after the other.
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return []
+    ids = ids.reshape(len(ids), -1)
+    count = len(ids)
+    # Fixed seed so the coloring, and with it the solve order, is reproducible
+    priority = np.random.default_rng(0).permutation(count)
+    assigned = np.zeros(count, dtype=bool)
+    colors = []
+    while not assigned.all():
+        used = np.zeros(vertCount, dtype=bool)
+        candidates = np.flatnonzero(~assigned)
+        color = []
+        while len(candidates):
+            # Pick every candidate that has the lowest priority on all of its
+            # vertices, then drop the candidates touching a picked vertex
+            lowest = np.full(vertCount, count, dtype=np.int64)
+            for k in range(ids.shape[1]):
+                np.minimum.at(lowest, ids[candidates, k], priority[candidates])
+            picked = (lowest[ids[candidates]] == priority[candidates, None]).all(axis=1)
+            color.append(candidates[picked])
+            used[ids[candidates[picked]]] = True
+            candidates = candidates[~picked]
+            candidates = candidates[~used[ids[candidates]].any(axis=1)]
+        color = np.sort(np.concatenate(color))
+        assigned[color] = True
+        colors.append(color)
+    return colors
+
+def get_barycentric(points, positions, tetIds):
+    # (M, 4) barycentric coordinates of M points in their M tets, points
+    # outside a tet get coordinates outside [0, 1] that still sum to one.
+    # Degenerate tets give NaN.
+    p = positions[tetIds]
+    T = np.stack((p[:, 1] - p[:, 0], p[:, 2] - p[:, 0], p[:, 3] - p[:, 0]), axis=2)
+    valid = np.abs(np.linalg.det(T)) > 0.000000000000001
+    b = np.full((len(points), 4), np.nan, dtype=np.float64)
+    if valid.any():
+        b[valid, 1:] = np.linalg.solve(T[valid], (points[valid] - p[valid, 0])[:, :, None])[:, :, 0]
+        b[valid, 0] = 1.0 - b[valid, 1:].sum(axis=1)
+    return b
+
+def get_nearest(points, targets, radius):
+    # (M,) index of the nearest of (K, 3) targets for (M, 3) points. The
+    # search starts within radius and doubles it for the points that found
+    # nothing, until the cells would no longer split the targets. What is
+    # left is compared against every target. Points go in chunks so no more
+    # than about NearestPairLimit pairs are held at once.
+    nearest = np.zeros(len(points), dtype=np.int64)
+    if not len(points) or not len(targets):
+        return nearest
+    remaining = np.arange(len(points))
+    extent = float(np.ptp(targets, axis=0).max())
+    while len(remaining) and 0.0 < radius < extent:
+        grid = SpatialHash(radius, targets)
+        found = np.zeros(len(remaining), dtype=bool)
+        for ids, entries in grid.query_chunks(points[remaining], radius):
+            if not len(ids):
+                continue
+            vector = points[remaining[ids]] - targets[entries]
+            distance = np.einsum("ij,ij->i", vector, vector)
+            order = np.lexsort((distance, ids))
+            first = order[np.r_[True, ids[order][1:] != ids[order][:-1]]]
+            nearest[remaining[ids[first]]] = entries[first]
+            found[ids[first]] = True
+        remaining = remaining[~found]
+        radius *= 2.0
+    # |t|^2 - 2 p.t orders the targets like the squared distance does
+    lengths = np.einsum("ij,ij->i", targets, targets)
+    chunk = max(1, NearestPairLimit // len(targets))
+    for start in range(0, len(remaining), chunk):
+        ids = remaining[start:start + chunk]
+        nearest[ids] = (lengths[None] - 2.0 * points[ids] @ targets.T).argmin(axis=1)
+    return nearest
+
+def embed_points(points, positions, tetIds):
+    # Bind (M, 3) points to the tets of a mesh: the (M,) tet index and (M, 4)
+    # barycentric coordinates of each point in the tet that contains it, or
+    # in the nearest one for points outside the mesh. See deform_points.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    positions = np.asarray(positions, dtype=np.float64)
+    tetIds = np.asarray(tetIds, dtype=np.int64).reshape(-1, 4)
+    tetIndex = np.zeros(len(points), dtype=np.int64)
+    bary = np.zeros((len(points), 4), dtype=np.float64)
+    bary[:, 0] = 1.0
+    if not len(points) or not len(tetIds):
+        return tetIndex, bary
+    centers = positions[tetIds].mean(axis=1)
+    reach = np.sqrt(np.einsum("ijk,ijk->ij", positions[tetIds] - centers[:, None], positions[tetIds] - centers[:, None]).max())
+    # A tet can only contain points within its largest center to vertex
+    # distance, so those are the candidates. The best candidate is the one
+    # the point is deepest inside, its smallest coordinate is the largest.
+    score = np.full(len(points), -np.inf)
+    if reach > 0.0:
+        for ids, tets in SpatialHash(reach, centers).query_chunks(points, reach):
+            if not len(ids):
+                continue
+            b = get_barycentric(points[ids], positions, tetIds[tets])
+            depth = np.nan_to_num(b.min(axis=1), nan=-np.inf)
+            order = np.lexsort((depth, ids))
+            last = np.r_[ids[order][1:] != ids[order][:-1], True]
+            best = order[last]
+            score[ids[best]] = depth[best]
+            tetIndex[ids[best]] = tets[best]
+            bary[ids[best]] = b[best]
+    # Points far outside the mesh follow the tet with the nearest center
+    outside = np.flatnonzero(score < -0.5)
+    if len(outside):
+        nearest = get_nearest(points[outside], centers, reach)
+        b = get_barycentric(points[outside], positions, tetIds[nearest])
+        usable = ~np.isnan(b).any(axis=1)
+        tetIndex[outside[usable]] = nearest[usable]
+        bary[outside[usable]] = b[usable]
+    return tetIndex, bary
+
+def deform_points(positions, tetIds, tetIndex, bary):
+    # Positions of embedded points, one gather over the tet vertices
+    return np.einsum("ij,ijk->ik", bary, positions[tetIds[tetIndex]])
+
+def coarsen_mesh(restPos, tetIds, edgeIds, spacing):
+    # One coarser level of a tet mesh: vertices in the same grid cell of the
+    # given spacing merge into one at their mean. Tets and edges are mapped
+    # onto the merged vertices, the ones that collapsed or flattened are
+    # dropped and duplicates kept once. Returns the (N,) cluster of every
+    # vertex, the coarse rest positions, tet ids and edge ids.
+    cells = np.floor(restPos / spacing).astype(np.int64)
+    cells, clusters = np.unique(cells, axis=0, return_inverse=True)
+    clusters = clusters.reshape(-1)
+    counts = np.bincount(clusters, minlength=len(cells)).astype(np.float64)
+    coarseRest = np.stack([np.bincount(clusters, weights=restPos[:, k], minlength=len(cells)) for k in range(3)], axis=1) / counts[:, None]
+    tets = clusters[tetIds]
+    tets = tets[(np.diff(np.sort(tets, axis=1), axis=1) != 0).all(axis=1)]
+    tets = tets[np.unique(np.sort(tets, axis=1), axis=0, return_index=True)[1]]
+    volumes = get_tet_volumes(coarseRest, tets)
+    # Tets flatter than a tenth of a cell cube would only add noise
+    keep = np.abs(volumes) > 0.1 * spacing ** 3 / 6.0
+    tets = tets[keep]
+    negative = volumes[keep] < 0.0
+    tets[negative] = tets[negative][:, [1, 0, 2, 3]]
+    edges = np.sort(clusters[edgeIds], axis=1)
+    edges = np.unique(edges[edges[:, 0] != edges[:, 1]], axis=0)
+    return clusters, coarseRest, tets, edges
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class SpatialHash:
+    # Uniform grid over points, hashed into a dense table of 2 * N buckets.
+    # Points are counted into buckets and stored sorted by bucket, so one
+    # bucket is a contiguous run of cellEntries from cellStart[h].
+    def __init__(self, spacing, positions, owners=None):
+        #-------------------------------------------------------------------
+        # Initialize cell size, queries reach at most this far
+        self.spacing = spacing
+        # Initialize positions, (N, 3) float64
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        # Initialize owners, (N,) int64 id of the body each point belongs to, or None
+        self.owners = owners
+        # Initialize table size
+        self.tableSize = 2 * max(len(self.positions), 1)
+        #-------------------------------------------------------------------
+        buckets = self.hash_cells(self.get_cells(self.positions))
+        # Initialize cell starts, (tableSize + 1,) first entry of every bucket
+        self.cellStart = np.zeros(self.tableSize + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self.tableSize), out=self.cellStart[1:])
+        # Initialize cell entries, (N,) point ids sorted by bucket
+        self.cellEntries = np.argsort(buckets, kind="stable")
+
+    def get_cells(self, points):
+        return np.floor(points / self.spacing).astype(np.int64)
+
+    def hash_cells(self, cells):
+        # Integer overflow is part of the hash
+        with np.errstate(over="ignore"):
+            h = (cells[:, 0] * 92837111) ^ (cells[:, 1] * 689287499) ^ (cells[:, 2] * 283923481)
+        return np.abs(h) % self.tableSize
+
+    def query(self, points, maxDist, exclude=None):
+        # Every (point, entry) pair closer than maxDist, which must not be
+        # larger than the spacing. Entries owned by exclude are skipped.
+        cells = self.get_cells(points)
+        pointIds = []
+        entryIds = []
+        for offset in NeighborOffsets:
+            buckets = self.hash_cells(cells + offset)
+            start = self.cellStart[buckets]
+            count = self.cellStart[buckets + 1] - start
+            total = count.sum()
+            if not total:
+                continue
+            # Expand every point into the run of entries of its bucket
+            first = np.repeat(start - (np.cumsum(count) - count), count)
+            pointIds.append(np.repeat(np.arange(len(points)), count))
+            entryIds.append(self.cellEntries[first + np.arange(total)])
+        if not pointIds:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pointIds = np.concatenate(pointIds)
+        entryIds = np.concatenate(entryIds)
+        if exclude is not None and self.owners is not None:
+            keep = self.owners[entryIds] != exclude
+            pointIds = pointIds[keep]
+            entryIds = entryIds[keep]
+        vector = points[pointIds] - self.positions[entryIds]
+        keep = np.einsum("ij,ij->i", vector, vector) < maxDist * maxDist
+        # Neighboring cells can share a bucket, which finds a pair twice
+        pairs = np.unique(pointIds[keep] * len(self.positions) + entryIds[keep])
+        return pairs // len(self.positions), pairs % len(self.positions)
+
+    def query_chunks(self, points, maxDist, exclude=None):
+        # The pairs of query, one chunk of points after the other, so about
+        # NearestPairLimit candidate pairs are held at once. Yields (point,
+        # entry) pairs with indices into all points.
+        if not len(self.positions):
+            return
+        # A point pairs with at most the 27 buckets around it
+        chunk = max(1, NearestPairLimit // min(len(self.positions), 27 * int(np.diff(self.cellStart).max())))
+        for start in range(0, len(points), chunk):
+            ids, entries = self.query(points[start:start + chunk], maxDist, exclude)
+            yield ids + start, entries
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class Settings:
+    # Solver parameters. Mass, stiffness and damping are full values, the
+    # add-on panel shows them as a factor times a power of ten.
+    def __init__(self, substeps=3, distanceIterations=1, volumeIterations=1, collisionIterations=3, pinIterations=1,
+                 distanceMass=1.0, distanceStiffness=1000.0, distanceDamping=1.0,
+                 volumeStiffness=100000.0, volumeDamping=1.0,
+                 collisionRadius=0.1, friction=1.0, selfCollision=False,
+                 sleepThreshold=0.0, sleepFrames=10,
+                 adaptiveSubsteps=False, minSubsteps=1, maxSubsteps=20, targetStrain=0.05,
+                 tolerance=0.0, relaxation='NONE', omega=1.0, spectralRadius=0.9,
+                 multigridLevels=0, coarsening=1.5):
+        self.substeps = substeps
+        self.distanceIterations = distanceIterations
+        self.volumeIterations = volumeIterations
+        self.collisionIterations = collisionIterations
+        self.pinIterations = pinIterations
+        self.distanceMass = distanceMass
+        self.distanceStiffness = distanceStiffness
+        self.distanceDamping = distanceDamping
+        self.volumeStiffness = volumeStiffness
+        self.volumeDamping = volumeDamping
+        self.collisionRadius = collisionRadius
+        self.friction = friction
+        self.selfCollision = selfCollision
+        # A body whose free vertices move less than sleepThreshold per frame for
+        # sleepFrames frames in a row sleeps, 0 never sleeps
+        self.sleepThreshold = sleepThreshold
+        self.sleepFrames = sleepFrames
+        # With adaptive substeps, substeps is ignored and every frame picks its
+        # own count within minSubsteps and maxSubsteps, see get_substeps
+        self.adaptiveSubsteps = adaptiveSubsteps
+        self.minSubsteps = minSubsteps
+        self.maxSubsteps = maxSubsteps
+        self.targetStrain = targetStrain
+        # Constraint passes stop early once the largest relative error before
+        # a pass is below tolerance, the iteration counts are upper limits
+        self.tolerance = tolerance
+        # Acceleration of the constraint passes, 'NONE', 'SOR' scaling every
+        # correction by omega, or 'CHEBYSHEV' blending the passes with the
+        # weights of the given spectral radius, see Solver.chebyshev
+        self.relaxation = relaxation
+        self.omega = omega
+        self.spectralRadius = spectralRadius
+        # Coarser levels solved before the mesh itself in every substep, each
+        # merging the vertices within coarsening times the median edge
+        # length of the level above, see Solver.build_levels
+        self.multigridLevels = multigridLevels
+        self.coarsening = coarsening
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class Solver:
+    # XPBD tetrahedral soft body on plain arrays. Colliders are optional and
+    # only need cull(start, end, radius) and find_nearest_batch(points, radius),
+    # see ColliderRegistry in the add-on for the Blender implementation.
+    # A topology from get_topology of a solver on a mesh with the same
+    # connectivity skips the ordering and coloring, the rest data is always
+    # computed from restPos.
+    # Vertices are stored sorted along a Z-order curve and constraints by
+    # their first vertex, so the passes walk memory mostly forward. Every
+    # array attribute is in that internal order, the accessors below and
+    # get_topology use the original vertex order.
+    def __init__(self, restPos, tetIds, edgeIds, topology=None):
+        #-------------------------------------------------------------------
+        restPos = np.asarray(restPos, dtype=np.float64).reshape(-1, 3)
+        # Initialize order, (N,) original index of every internal vertex
+        if topology is None:
+            self.order = get_morton_order(restPos)
+        else:
+            self.order = np.asarray(topology["order"], dtype=np.int64)
+        # Initialize rank, (N,) internal index of every original vertex
+        self.rank = np.empty(len(self.order), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(self.order))
+        # Initialize rest position array, (N, 3) float64
+        self.restPos = restPos[self.order]
+        # Initialize vert count
+        self.vertCount = len(self.restPos)
+        # Initialize verts array, (N, 3) float64
+        self.verts = self.restPos.copy()
+        # Initialize current position array, (N, 3) float64
+        self.currentPos = self.restPos.copy()
+        # Initialize previous position array, (N, 3) float64
+        self.previousPos = self.restPos.copy()
+        # Initialize inverse mass array, (N,) float64
+        self.invMass = np.ones(self.vertCount, dtype=np.float64)
+        # Initialize pin weight array, (N,) float64
+        self.pinWeights = np.zeros(self.vertCount, dtype=np.float64)
+        # Initialize pinned verts array, vertices snapped back to rest after a step
+        self.pinnedVerts = np.zeros(0, dtype=np.int64)
+        # Initialize pin verts array, every vertex with a pin weight above 0
+        self.pinVerts = np.zeros(0, dtype=np.int64)
+        # Initialize tet ID:s array, (T, 4) int32 internal vertex indices
+        self.tetIds = self.rank[np.asarray(tetIds, dtype=np.int64).reshape(-1, 4)].astype(np.int32)
+        # Initialize edge ID:s array, (E, 2) int32 internal vertex indices
+        self.edgeIds = self.rank[np.asarray(edgeIds, dtype=np.int64).reshape(-1, 2)].astype(np.int32)
+        if topology is None:
+            # A topology comes sorted already
+            self.tetIds = self.tetIds[np.lexsort(self.tetIds.T[::-1])]
+            self.edgeIds = self.edgeIds[np.lexsort(self.edgeIds.T[::-1])]
+            # Initialize tet colors array, int32 tet indices per conflict-free batch
+            self.tetColors = [i.astype(np.int32) for i in color_constraints(self.tetIds, self.vertCount)]
+            # Initialize edge colors array, int32 edge indices per conflict-free batch
+            self.edgeColors = [i.astype(np.int32) for i in color_constraints(self.edgeIds, self.vertCount)]
+        else:
+            self.tetColors = [np.asarray(i, dtype=np.int32) for i in topology["tetColors"]]
+            self.edgeColors = [np.asarray(i, dtype=np.int32) for i in topology["edgeColors"]]
+        # Initialize rest volume array, (T,) float32
+        self.restVol = get_tet_volumes(self.restPos, self.tetIds).astype(np.float32)
+        # Initialize edge Lengths array, (E,) float32
+        vector = self.restPos[self.edgeIds[:, 0]] - self.restPos[self.edgeIds[:, 1]]
+        self.edgeLengths = np.sqrt(np.einsum("ij,ij->i", vector, vector)).astype(np.float32)
+        # Initialize active edge colors array, edge colors without fully pinned edges
+        self.activeEdgeColors = []
+        # Initialize active tet colors array, tet colors without fully pinned tets
+        self.activeTetColors = []
+        # Initialize active edges and tets, every active constraint in one array for the error measure
+        self.activeEdges = np.zeros(0, dtype=np.int32)
+        self.activeTets = np.zeros(0, dtype=np.int32)
+        # Initialize shortest edge length, the element size adaptive substeps resolve
+        positive = self.edgeLengths[self.edgeLengths > 0.0]
+        self.minEdgeLength = float(positive.min()) if len(positive) else 0.0
+        # Initialize volume gain scale, the largest sum of squared volume gradients / 4 of a tet at rest
+        if len(self.tetIds):
+            grads = get_tet_gradients(self.restPos, self.tetIds)[0]
+            self.volumeGainScale = float(np.einsum("ijk,ijk->i", grads, grads).max()) / 4.0
+        else:
+            self.volumeGainScale = 0.0
+        # Initialize substeps and substep length of the last step
+        self.substeps = 0
+        self.lastSdt = 0.0
+        # Initialize residual, the largest relative constraint error left after the last step, and the one before
+        self.residual = 0.0
+        self.lastResidual = 0.0
+        # Initialize residuals, the largest relative edge length / volume error the last step left, see step
+        self.distanceResidual = 0.0
+        self.volumeResidual = 0.0
+        # Initialize passes, constraint passes run over the last step
+        self.distancePasses = 0
+        self.volumePasses = 0
+        # Initialize sleeping flag, a sleeping solver skips its steps until woken
+        self.sleeping = False
+        # Initialize quiet frames, steps in a row the free vertices stayed below the sleep threshold
+        self.quietFrames = 0
+        # Initialize coarse level, a Solver on the merged vertices or None, see build_levels
+        self.coarse = None
+        # Initialize levels key, the (levels, coarsening) the coarse levels were built with
+        self.levelsKey = (0, 0.0)
+        # Initialize clusters, (N,) coarse vertex of every vertex, and their sizes
+        self.clusters = None
+        self.clusterCounts = None
+        # Initialize coarse embedding, coarse tet and (N, 4) barycentric coordinates of every rest vertex
+        self.coarseTet = None
+        self.coarseBary = None
+        # Initialize matrix, (4, 4) transform of the positions to the space colliders work in, None for the same space
+        self.matrix = None
+        #-------------------------------------------------------------------
+        self.update_active_constraints()
+
+    #-----------------------------------------------------------------------
+    # State accessors. Every array is (N, 3) float64 in the original vertex
+    # order, except the inverse masses and pin weights which are (N,).
+    # Getters return copies, setters copy the given array in place so the
+    # solver keeps its own contiguous storage.
+
+    def get_positions(self):
+        return self.verts[self.rank]
+
+    def set_positions(self, positions):
+        self._set_state(self.verts, positions)
+        self._set_state(self.currentPos, positions)
+
+    def get_previous_positions(self):
+        return self.previousPos[self.rank]
+
+    def set_previous_positions(self, positions):
+        self._set_state(self.previousPos, positions)
+
+    def get_rest_positions(self):
+        return self.restPos[self.rank]
+
+    def get_pin_weights(self):
+        return self.pinWeights[self.rank]
+
+    def set_pin_weights(self, pinWeights):
+        self._set_state(self.pinWeights, pinWeights)
+        # Fully pinned vertices are kinematic: zero inverse mass
+        self.invMass[:] = np.where(self.pinWeights == 1.0, 0.0, 1.0)
+        self.pinnedVerts = np.flatnonzero(self.pinWeights > 0.9)
+        self.pinVerts = np.flatnonzero(self.pinWeights > 0.0)
+        self.update_active_constraints()
+
+    def get_inverse_masses(self):
+        return self.invMass[self.rank]
+
+    def set_inverse_masses(self, invMass):
+        self._set_state(self.invMass, invMass)
+        self.update_active_constraints()
+
+    def _set_state(self, target, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size != target.size:
+            raise ValueError("expected %d values, got %d" % (target.size, values.size))
+        target[:] = values.reshape(target.shape)[self.order]
+
+    def to_internal(self, values):
+        # Rows of a per vertex array in the original order, in internal order
+        return np.asarray(values)[self.order]
+
+    def to_original(self, values):
+        # Rows of a per vertex array in internal order, in the original order
+        return np.asarray(values)[self.rank]
+
+    def get_topology(self):
+        # Everything derived from the connectivity alone, for the topology
+        # cache. The ids are original vertex indices in the sorted constraint
+        # order. The order came from the rest positions of this solver, any
+        # other permutation is as correct, only slower.
+        return {
+            "order": self.order,
+            "tetIds": self.order[self.tetIds],
+            "edgeIds": self.order[self.edgeIds],
+            "tetColors": self.tetColors,
+            "edgeColors": self.edgeColors,
+        }
+
+    #-----------------------------------------------------------------------
+
+    def update_active_constraints(self):
+        # Constraints whose vertices all have zero inverse mass never move anything
+        edgeActive = (self.invMass[self.edgeIds] > 0.0).any(axis=1)
+        tetActive = (self.invMass[self.tetIds] > 0.0).any(axis=1)
+        self.activeEdgeColors = [c[edgeActive[c]] for c in self.edgeColors if edgeActive[c].any()]
+        self.activeTetColors = [c[tetActive[c]] for c in self.tetColors if tetActive[c].any()]
+        self.activeEdges = np.flatnonzero(edgeActive).astype(np.int32)
+        self.activeTets = np.flatnonzero(tetActive).astype(np.int32)
+        if self.coarse is not None:
+            # A coarse vertex holding a kinematic vertex is kinematic itself
+            fixed = np.bincount(self.clusters, weights=(self.invMass == 0.0).astype(np.float64), minlength=self.coarse.vertCount)
+            self.coarse.invMass[:] = np.where(fixed > 0.0, 0.0, 1.0)
+            self.coarse.update_active_constraints()
+
+    def build_levels(self, levels, coarsening=1.5):
+        # Build levels coarser meshes below this one, each a Solver of its
+        # own. Coarsening stops early once a level has too few tets to carry
+        # the vertices above it or stops shrinking.
+        self.levelsKey = (levels, coarsening)
+        self.coarse = None
+        self.clusters = None
+        self.clusterCounts = None
+        self.coarseTet = None
+        self.coarseBary = None
+        if levels <= 0 or not len(self.edgeLengths):
+            return
+        spacing = coarsening * float(np.median(self.edgeLengths))
+        if spacing <= 0.0:
+            return
+        clusters, coarseRest, coarseTets, coarseEdges = coarsen_mesh(self.restPos, self.tetIds, self.edgeIds, spacing)
+        if len(coarseTets) < 2 or len(coarseRest) > 0.9 * self.vertCount:
+            return
+        self.coarse = Solver(coarseRest, coarseTets, coarseEdges)
+        self.coarse.build_levels(levels - 1, coarsening)
+        # Both in the coarse solver's internal order
+        self.clusters = self.coarse.rank[clusters]
+        self.clusterCounts = np.bincount(self.clusters, minlength=self.coarse.vertCount).astype(np.float64)
+        self.coarseTet, self.coarseBary = embed_points(self.restPos, self.coarse.restPos, self.coarse.tetIds)
+        self.update_active_constraints()
+
+    def get_level_count(self):
+        return 0 if self.coarse is None else 1 + self.coarse.get_level_count()
+
+    def reset(self):
+        self.verts[:] = self.restPos
+        self.currentPos[:] = self.restPos
+        self.previousPos[:] = self.restPos
+        self.substeps = 0
+        self.lastSdt = 0.0
+        self.residual = 0.0
+        self.lastResidual = 0.0
+        self.distanceResidual = 0.0
+        self.volumeResidual = 0.0
+        self.wake()
+
+    def get_step_state(self):
+        # What the next step depends on beyond the positions, as a
+        # (StepStateSize,) float64 array to store along with them
+        return np.array((self.substeps, self.lastSdt, self.residual, self.lastResidual, self.quietFrames, self.sleeping), dtype=np.float64)
+
+    def set_step_state(self, state):
+        self.substeps = int(state[0])
+        self.lastSdt = float(state[1])
+        self.residual = float(state[2])
+        self.lastResidual = float(state[3])
+        self.quietFrames = int(state[4])
+        self.sleeping = bool(state[5])
+
+    def sleep(self):
+        # Come to a full stop, waking starts from zero velocity
+        self.sleeping = True
+        self.currentPos[:] = self.verts
+        self.previousPos[:] = self.verts
+
+    def wake(self):
+        self.sleeping = False
+        self.quietFrames = 0
+
+    def step(self, dt, gravity, settings, colliders=None, profile=NullProfile, obstacles=None, matrix=None):
+        # Advance one frame of length dt. Obstacles are (SpatialHash, owner,
+        # matrix), points of other bodies this one is pushed out of, see
+        # solve_obstacles. Matrix takes the positions to collider space, the
+        # world space of the add-on's colliders.
+        self.matrix = None if matrix is None else np.asarray(matrix, dtype=np.float64)
+        if self.sleeping:
+            self.verts[self.pinnedVerts] = self.restPos[self.pinnedVerts]
+            return
+        if settings.sleepThreshold > 0.0:
+            start = self.verts.copy()
+        self.distancePasses = 0
+        self.volumePasses = 0
+        if self.levelsKey != (settings.multigridLevels, settings.coarsening):
+            self.build_levels(settings.multigridLevels, settings.coarsening)
+        if settings.adaptiveSubsteps:
+            self.substeps = self.get_substeps(dt, gravity, settings)
+        else:
+            self.substeps = settings.substeps
+        with profile.phase("substeps"):
+            if self.substeps > 0:
+                sdt = dt / self.substeps
+                if self.lastSdt > 0.0 and sdt != self.lastSdt:
+                    # Velocity is carried as the displacement of one substep,
+                    # so a new substep length has to scale it along
+                    free = self.invMass > 0.0
+                    self.previousPos[free] = self.verts[free] - (self.verts[free] - self.previousPos[free]) * (sdt / self.lastSdt)
+                self.lastSdt = sdt
+                gravity = np.asarray(gravity, dtype=np.float64) * sdt
+                for i in range(self.substeps):
+                    self.pre_solve(sdt, gravity, settings, colliders)
+                    self.solve(sdt, settings, obstacles)
+                    self.post_solve()
+                # The error the last substep left, only measured when adaptive
+                # substeps or the tolerance use it
+                if settings.adaptiveSubsteps or settings.tolerance > 0.0:
+                    self.distanceResidual = self.get_edge_error() if settings.distanceIterations > 0 else 0.0
+                    self.volumeResidual = self.get_volume_error() if settings.volumeIterations > 0 else 0.0
+
+        with profile.phase("pins"):
+            self.verts[self.pinnedVerts] = self.restPos[self.pinnedVerts]
+
+        if settings.adaptiveSubsteps:
+            self.lastResidual = self.residual
+            self.residual = self.get_residual(settings)
+
+        if settings.sleepThreshold > 0.0:
+            # Only free vertices count, pinned ones follow their driver
+            moved = self.verts[self.invMass > 0.0] - start[self.invMass > 0.0]
+            motion = np.sqrt(np.einsum("ij,ij->i", moved, moved).max()) if len(moved) else 0.0
+            self.quietFrames = self.quietFrames + 1 if motion < settings.sleepThreshold else 0
+            if self.quietFrames >= settings.sleepFrames:
+                self.sleep()
+
+    def get_substeps(self, dt, gravity, settings):
+        # Two lower bounds, the larger one wins:
+        # - Stability: one projection corrects a constraint by its gain times
+        #   its error, with the gain growing as stiffness * sdt^2. Above one
+        #   it overshoots, so stiff materials need short substeps.
+        # - CFL: no free vertex may travel more than a fraction of the
+        #   collision radius or of the shortest edge in one substep. The
+        #   speed is the one of the last substep, on the first step the
+        #   speed gravity gives over the frame.
+        # The count rises at once. It is held while the constraint error
+        # left by the last frame is above the target and still falling, a
+        # body working off a hit keeps its substeps. An error that stays,
+        # like the sag of a body resting under its own weight, does not
+        # hold it. Otherwise the count drops by at most a quarter per frame.
+        # The error does not raise the count: n substeps each correct
+        # stiffness * sdt^2 of it, about stiffness * dt^2 / n over the
+        # frame, so more of them would not bring it down.
+        gain = 0.0
+        if settings.distanceIterations > 0 and len(self.edgeIds):
+            gain = 2.0 * settings.distanceStiffness / (settings.distanceMass * settings.distanceDamping)
+        if settings.volumeIterations > 0:
+            gain = max(gain, settings.volumeStiffness * self.volumeGainScale / settings.volumeDamping)
+        if settings.relaxation == 'SOR':
+            gain *= settings.omega
+        free = self.invMass > 0.0
+        if self.lastSdt > 0.0:
+            speed = 0.0
+            if free.any():
+                velocity = (self.verts[free] - self.previousPos[free]) / self.lastSdt
+                speed = np.sqrt(np.einsum("ij,ij->i", velocity, velocity).max())
+        else:
+            speed = np.linalg.norm(np.asarray(gravity, dtype=np.float64)) * dt
+        lengths = [i for i in (settings.collisionRadius, self.minEdgeLength) if i > 0.0]
+        substeps = max(settings.minSubsteps, int(np.ceil(dt * np.sqrt(gain))))
+        if lengths:
+            substeps = max(substeps, int(np.ceil(speed * dt / (CourantNumber * min(lengths)))))
+        if settings.targetStrain > 0.0 and settings.targetStrain < self.residual < self.lastResidual * ResidualFalling:
+            substeps = max(substeps, self.substeps)
+        substeps = max(substeps, self.substeps - max(self.substeps // 4, 1))
+        return int(min(max(substeps, settings.minSubsteps), settings.maxSubsteps))
+
+    def get_residual(self, settings):
+        # Largest relative error the constraint passes of the last substep
+        # left, see step
+        return max(self.distanceResidual, self.volumeResidual)
+
+    def pre_solve(self, sdt, gravity, settings, colliders=None):
+        free = self.invMass > 0.0
+        self.currentPos[free] = self.verts[free]
+        velocity = self.currentPos - self.previousPos
+        speed = np.sqrt(np.einsum("ij,ij->i", velocity, velocity))
+        velocity[speed > 0.000000000000001] *= 1.0 / sdt
+        displacement = (velocity + gravity) * sdt
+        length = np.sqrt(np.einsum("ij,ij->i", displacement, displacement))
+        free &= (length <= 100000.0) & (length >= 0.000000000000001)
+        if settings.collisionIterations == 0 or colliders is None:
+            self.verts[free] += displacement[free]
+        else:
+            ids = np.flatnonzero(free)
+            # Only vertices whose swept path gets near a collider are queried
+            start = self.verts[ids]
+            end = start + displacement[ids]
+            if self.matrix is not None:
+                start = start @ self.matrix[:3, :3].T + self.matrix[:3, 3]
+                end = end @ self.matrix[:3, :3].T + self.matrix[:3, 3]
+            near = colliders.cull(start, end, settings.collisionRadius)
+            self.verts[ids[~near]] += displacement[ids[~near]]
+            self.collisions(sdt, ids[near], displacement[ids[near]], velocity[ids[near]], settings, colliders)
+
+    def collisions(self, sdt, ids, displacement, velocity, settings, colliders):
+        collisionIterations = settings.collisionIterations
+        collisionRadius = settings.collisionRadius
+        displacementIterative = displacement / collisionIterations
+        length = np.sqrt(np.einsum("ij,ij->i", displacementIterative, displacementIterative))
+        moving = (length <= 100000.0) & (length >= 0.000000000000001)
+        ids = ids[moving]
+        displacementIterative = displacementIterative[moving]
+        velocity = velocity[moving]
+        positions = self.verts[ids]
+        # Resolved in collider space and brought back afterwards
+        if self.matrix is not None:
+            rotation = self.matrix[:3, :3]
+            positions = positions @ rotation.T + self.matrix[:3, 3]
+            displacementIterative = displacementIterative @ rotation.T
+            velocity = velocity @ rotation.T
+        for its in range(collisionIterations):
+            positions += displacementIterative
+            location, bvhNormal, bvhDistance = colliders.find_nearest_batch(positions, collisionRadius)
+            hit = np.flatnonzero(bvhDistance < collisionRadius)
+            if not len(hit):
+                continue
+            normal = bvhNormal[hit]
+            positions[hit] += normal * (collisionRadius - bvhDistance[hit])[:, None]
+            normalComponent = normal * np.einsum("ij,ij->i", velocity[hit], normal)[:, None]
+            tangentialComponent = velocity[hit] - normalComponent
+            tangentialComponent *= settings.friction
+            velocity[hit] = normalComponent + tangentialComponent
+            speed = np.sqrt(np.einsum("ij,ij->i", velocity[hit], velocity[hit]))
+            hit = hit[(speed <= 100000.0) & (speed >= 0.000000000000001)]
+            velocity[hit] = velocity[hit] / collisionIterations * sdt
+            positions[hit] -= velocity[hit]
+        if self.matrix is not None:
+            positions = (positions - self.matrix[:3, 3]) @ np.linalg.inv(rotation).T
+        self.verts[ids] = positions
+
+    def solve(self, sdt, settings, obstacles=None):
+        self.solve_constraints(sdt, settings)
+        if settings.selfCollision and settings.collisionRadius > 0.0:
+            self.solve_self_collisions(settings)
+        if obstacles is not None and settings.collisionRadius > 0.0:
+            self.solve_obstacles(settings, *obstacles)
+        #for i in range(settings.pinIterations):
+            #self.solve_pin(sdt)
+
+    def solve_constraints(self, sdt, settings):
+        # Coarse to fine, the coarse level first takes out the error that
+        # spans many elements, which the passes below only spread slowly
+        if self.coarse is not None:
+            self.solve_coarse(sdt, settings)
+        omega = settings.omega if settings.relaxation == 'SOR' else 1.0
+        chebyshev = settings.relaxation == 'CHEBYSHEV'
+        # A pass returns the error it started from, taken from the C arrays
+        # it computes anyway. Once that is within tolerance the passes stop.
+        previous = None
+        weight = 1.0
+        for i in range(settings.distanceIterations):
+            current = self.verts.copy() if chebyshev else None
+            error = self.solve_edges(sdt, settings, omega)
+            if chebyshev:
+                weight = self.chebyshev(i, weight, settings.spectralRadius, previous)
+                previous = current
+            self.distancePasses += 1
+            if error < settings.tolerance:
+                break
+        previous = None
+        weight = 1.0
+        for i in range(settings.volumeIterations):
+            current = self.verts.copy() if chebyshev else None
+            error = self.solve_volumes(sdt, settings, omega)
+            if chebyshev:
+                weight = self.chebyshev(i, weight, settings.spectralRadius, previous)
+                previous = current
+            self.volumePasses += 1
+            if error < settings.tolerance:
+                break
+
+    def get_edge_error(self):
+        # Largest relative length error of the active edges, a full pass
+        # over them, see step for when it is measured
+        if not len(self.activeEdges):
+            return 0.0
+        edges = self.edgeIds[self.activeEdges]
+        vector = self.verts[edges[:, 0]] - self.verts[edges[:, 1]]
+        lengths = self.edgeLengths[self.activeEdges]
+        C = np.sqrt(np.einsum("ij,ij->i", vector, vector)) - lengths
+        return float((np.abs(C) / np.maximum(lengths, 0.000000000000001)).max())
+
+    def get_volume_error(self):
+        # Largest relative volume error of the active tets the passes correct
+        if not len(self.activeTets):
+            return 0.0
+        grads, w, vol = get_tet_gradients(self.verts, self.tetIds[self.activeTets])
+        restVol = self.restVol[self.activeTets]
+        C = vol - restVol
+        active = (C <= 1.0) & (w != 0.0)
+        if not active.any():
+            return 0.0
+        return float((np.abs(C[active]) / np.maximum(np.abs(restVol[active]), 0.000000000000001)).max())
+
+    def solve_coarse(self, sdt, settings):
+        # Restrict: coarse vertices sit at the mean of their cluster
+        coarse = self.coarse
+        before = np.stack([np.bincount(self.clusters, weights=self.verts[:, k], minlength=coarse.vertCount) for k in range(3)], axis=1) / self.clusterCounts[:, None]
+        coarse.verts[:] = before
+        coarse.solve_constraints(sdt, settings)
+        # Prolong: every free vertex moves with the coarse tet it is embedded in
+        correction = deform_points(coarse.verts - before, coarse.tetIds, self.coarseTet, self.coarseBary)
+        free = self.invMass > 0.0
+        self.verts[free] += correction[free]
+
+    def chebyshev(self, iteration, weight, spectralRadius, previous):
+        # Chebyshev semi-iterative acceleration of pass iteration, given the
+        # weight of the pass before and the positions from before that pass:
+        # x = weight * (x - previous) + previous. The first pass is left as it
+        # is. Returns the weight of this pass.
+        if iteration == 0:
+            return 1.0
+        if iteration == 1:
+            weight = 2.0 / (2.0 - spectralRadius * spectralRadius)
+        else:
+            weight = 4.0 / (4.0 - spectralRadius * spectralRadius * weight)
+        displacement = (self.verts - previous) * weight
+        length = np.sqrt(np.einsum("ij,ij->i", displacement, displacement))
+        # The same clamp as the passes, pinned vertices did not move at all
+        valid = (length <= 100000.0) & (self.invMass > 0.0)
+        self.verts[valid] = previous[valid] + displacement[valid]
+        return weight
+
+    def solve_edges(self, sdt, settings, omega=1.0):
+        # Returns the largest relative length error the pass started from
+        # with a tolerance, 0 without one
+        distanceAlpha = 1 / settings.distanceStiffness / sdt / sdt
+        distanceMass = 1 / settings.distanceMass
+        distanceDamping = 1 / settings.distanceDamping
+        error = 0.0
+
+        # Edges inside one color share no vertex, so each color is one
+        # gather/compute/scatter pass and the colors run Gauss-Seidel style.
+        for color in self.activeEdgeColors:
+            id0 = self.edgeIds[color, 0]
+            id1 = self.edgeIds[color, 1]
+            vector = self.verts[id0] - self.verts[id1]
+            currentDistance = np.sqrt(np.einsum("ij,ij->i", vector, vector))
+            valid = currentDistance >= 0.000000000000001
+            vector[valid] *= (1.0 / currentDistance[valid])[:, None]
+            C = currentDistance - self.edgeLengths[color]
+            if settings.tolerance > 0.0 and len(C):
+                error = max(error, float((np.abs(C) / np.maximum(self.edgeLengths[color], 0.000000000000001)).max()))
+            s = -C / distanceAlpha
+            displacement = (vector * (s * distanceMass * omega)[:, None]) * distanceDamping
+            length = np.sqrt(np.einsum("ij,ij->i", displacement, displacement))
+            valid &= (length <= 100000.0) & (length >= 0.000000000000001)
+            id0 = id0[valid]
+            id1 = id1[valid]
+            self.verts[id0] += displacement[valid] * self.invMass[id0, None]
+            self.verts[id1] -= displacement[valid] * self.invMass[id1, None]
+        return error
+
+    def solve_volumes(self, sdt, settings, omega=1.0):
+        # Returns the largest relative volume error the pass started from
+        # with a tolerance, 0 without one
+        volumeAlpha = 1 / settings.volumeStiffness / sdt / sdt
+        volumeDamping = 1 / settings.volumeDamping
+        error = 0.0
+
+        # Tets inside one color share no vertex, so the gradients, volumes
+        # and corrections of a whole color are computed and scattered at once.
+        for color in self.activeTetColors:
+            tets = self.tetIds[color]
+            grads, w, vol = get_tet_gradients(self.verts, tets)
+            C = vol - self.restVol[color]
+            active = (C <= 1.0) & (w != 0.0)
+            if settings.tolerance > 0.0 and active.any():
+                error = max(error, float((np.abs(C[active]) / np.maximum(np.abs(self.restVol[color][active]), 0.000000000000001)).max()))
+            s = np.zeros(len(tets), dtype=np.float64)
+            s[active] = -C[active] / (w[active] * volumeAlpha)
+            displacement = (grads * (s * (w / 4) * omega)[:, None, None]) * volumeDamping
+            length = np.sqrt(np.einsum("ijk,ijk->ij", displacement, displacement))
+            valid = active[:, None] & (length <= 100000.0) & (length >= 0.000000000000001)
+            ids = tets[valid]
+            self.verts[ids] += displacement[valid] * self.invMass[ids, None]
+        return error
+
+    def solve_self_collisions(self, settings):
+        # Vertices closer than two collision radii are pushed apart, except
+        # pairs that are that close at rest anyway, like the ends of an edge.
+        minDist = 2.0 * settings.collisionRadius
+        grid = SpatialHash(minDist, self.verts)
+        self.apply_averaged(self.get_self_contacts(grid, minDist))
+
+    def get_self_contacts(self, grid, minDist):
+        # (ids, displacement) of the close pairs, a chunk of them at a time
+        for id0, id1 in grid.query_chunks(self.verts, minDist):
+            keep = id0 < id1
+            id0 = id0[keep]
+            id1 = id1[keep]
+            rest = self.restPos[id0] - self.restPos[id1]
+            keep = np.einsum("ij,ij->i", rest, rest) >= minDist * minDist
+            id0 = id0[keep]
+            id1 = id1[keep]
+            vector = self.verts[id0] - self.verts[id1]
+            distance = np.sqrt(np.einsum("ij,ij->i", vector, vector))
+            w = self.invMass[id0] + self.invMass[id1]
+            valid = (distance >= 0.000000000000001) & (w > 0.0)
+            id0 = id0[valid]
+            id1 = id1[valid]
+            displacement = vector[valid] * ((minDist - distance[valid]) / (distance[valid] * w[valid]))[:, None]
+            yield np.concatenate((id0, id1)), np.concatenate((displacement * self.invMass[id0, None], -displacement * self.invMass[id1, None]))
+
+    def solve_obstacles(self, settings, obstacles, owner, matrix):
+        # Other bodies are points frozen at the start of the frame, vertices
+        # closer than two collision radii to one are moved out all the way.
+        # The (4, 4) matrix takes this body's positions to obstacle space.
+        minDist = 2.0 * settings.collisionRadius
+        rotation = np.asarray(matrix, dtype=np.float64)[:3, :3]
+        positions = self.verts @ rotation.T + np.asarray(matrix, dtype=np.float64)[:3, 3]
+        self.apply_averaged(self.get_obstacle_contacts(obstacles, owner, positions, minDist, np.linalg.inv(rotation)))
+
+    def get_obstacle_contacts(self, obstacles, owner, positions, minDist, inverse):
+        # (ids, displacement) of the vertices too close to an obstacle point,
+        # a chunk of them at a time, the displacement back in this body's space
+        for ids, entries in obstacles.query_chunks(positions, minDist, exclude=owner):
+            vector = positions[ids] - obstacles.positions[entries]
+            distance = np.sqrt(np.einsum("ij,ij->i", vector, vector))
+            valid = (distance >= 0.000000000000001) & (self.invMass[ids] > 0.0)
+            ids = ids[valid]
+            displacement = vector[valid] * ((minDist - distance[valid]) / distance[valid])[:, None]
+            yield ids, displacement @ inverse.T
+
+    def apply_averaged(self, contacts):
+        # A vertex in several contacts moves by the mean of its corrections.
+        # Contacts are (ids, displacement) chunks, summed before any moves.
+        total = np.zeros((self.vertCount, 3), dtype=np.float64)
+        count = np.zeros(self.vertCount, dtype=np.int64)
+        for ids, displacement in contacts:
+            if not len(ids):
+                continue
+            np.add.at(total, ids, displacement)
+            count += np.bincount(ids, minlength=self.vertCount)
+        moved = np.flatnonzero(count)
+        self.verts[moved] += total[moved] / count[moved, None]
+
+    def solve_pin(self, sdt):
+        stiffness = self.pinWeights
+        return
+
+    def post_solve(self):
+        self.previousPos[:] = self.currentPos
@@ -0,0 +1,114 @@
+import collections
+import contextlib
+import csv
+import json
+import time
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Frames of timings kept per profile
+HistoryLength = 250
+
+# Returned for every phase while a profile is not recording, entering and
+# leaving it does nothing
+NullPhase = contextlib.nullcontext()
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+class PhaseTimer:
+    __slots__ = ("times", "name", "start")
+
+    def __init__(self, times, name):
+        self.times = times
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.times[self.name] = self.times.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+class Profile:
+    def __init__(self, name):
+        #-------------------------------------------------------------------
+        # Initialize name, shown in the exports
+        self.name = name
+        # Initialize enabled flag, nothing is recorded while it is off
+        self.enabled = False
+        # Initialize history, (frame, {phase: seconds}) for the latest frames
+        self.history = collections.deque(maxlen=HistoryLength)
+        # Initialize frame and times being recorded, None between frames
+        self.frame = None
+        self.times = None
+        #-------------------------------------------------------------------
+
+    def begin(self, frame):
+        if self.enabled:
+            self.frame = frame
+            self.times = {}
+
+    def phase(self, name):
+        # Usage: with profile.phase("step"): ...
+        if self.times is None:
+            return NullPhase
+        return PhaseTimer(self.times, name)
+
+    def end(self):
+        if self.times is not None:
+            self.history.append((self.frame, self.times))
+        self.frame = None
+        self.times = None
+
+    def clear(self):
+        self.history.clear()
+
+    def get_phases(self):
+        # Phase names in the order they first ran
+        phases = {}
+        for frame, times in self.history:
+            phases.update(dict.fromkeys(times))
+        return list(phases)
+
+    def get_averages(self):
+        # Mean seconds per phase over the history
+        totals = collections.Counter()
+        for frame, times in self.history:
+            totals.update(times)
+        count = max(len(self.history), 1)
+        return {i: totals[i] / count for i in self.get_phases()}
+
+    def get_last(self):
+        if not self.history:
+            return {}
+        return dict(self.history[-1][1])
+
+# Never recording, for callers that were not handed a profile
+NullProfile = Profile("")
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+def write_csv(path, profiles):
+    # One row per profile and frame, one column per phase in milliseconds
+    phases = {}
+    for profile in profiles:
+        phases.update(dict.fromkeys(profile.get_phases()))
+    phases = list(phases)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["profile", "frame"] + phases + ["total"])
+        for profile in profiles:
+            for frame, times in profile.history:
+                writer.writerow([profile.name, frame] + ["%.4f" % (times.get(i, 0.0) * 1000.0) for i in phases] + ["%.4f" % (sum(times.values()) * 1000.0)])
+
+def write_json(path, profiles):
+    data = {}
+    for profile in profiles:
+        data[profile.name] = {
+            "averageMs": {i: j * 1000.0 for i, j in profile.get_averages().items()},
+            "frames": [{"frame": frame, "ms": {i: j * 1000.0 for i, j in times.items()}} for frame, times in profile.history],
+        }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,40 @@
+import numpy as np
+
+#//////////////////////////////////////////////////////////////////////////////////
+
+# Synthetic tet meshes and colliders for running the core solver without
+# Blender, used by the benchmark and the tests.
+
+def make_cube_tets(n, size=1.0, height=0.1):
+    # A cube of n^3 cells, each cell split into the 6 tets around its main
+    # diagonal, so neighboring cells share faces. The bottom sits at height.
+    g = np.linspace(0.0, size, n + 1)
+    x, y, z = np.meshgrid(g, g, g + height, indexing="ij")
+    restPos = np.stack((x.ravel(), y.ravel(), z.ravel()), axis=1)
+    ids = np.arange((n + 1) ** 3).reshape(n + 1, n + 1, n + 1)
+    corners = [ids[dx:n + dx, dy:n + dy, dz:n + dz].ravel() for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)]
+    tets = []
+    for a, b in ((1, 2), (2, 1), (1, 4), (4, 1), (2, 4), (4, 2)):
+        tets.append(np.stack((corners[0], corners[a], corners[a + b], corners[7]), axis=1))
+    tetIds = np.concatenate(tets)
+    # Orient every tet so its rest volume is positive
+    p = restPos[tetIds]
+    negative = np.einsum("ij,ij->i", np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0]), p[:, 3] - p[:, 0]) < 0.0
+    tetIds[negative] = tetIds[negative][:, [1, 0, 2, 3]]
+    edgeIds = np.concatenate([tetIds[:, [i, j]] for i, j in ((0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3))])
+    edgeIds = np.unique(np.sort(edgeIds, axis=1), axis=0)
+    return restPos, tetIds, edgeIds
+
+class GroundCollider:
+    # The z = 0 plane, with the interface Solver expects from colliders
+    def cull(self, start, end, radius):
+        return np.minimum(start[:, 2], end[:, 2]) <= radius
+
+    def find_nearest_batch(self, points, radius):
+        locations = points.copy()
+        locations[:, 2] = 0.0
+        normals = np.zeros_like(points)
+        normals[:, 2] = 1.0
+        distances = np.abs(points[:, 2])
+        distances[distances > radius] = np.inf
+        return locations, normals, distances